@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+from tempfile import TemporaryDirectory
+from time import time
+
+import main as app
+
+
+def make_files(folder, files, lines):
+    """Create 'files' files with 'lines' lines each and return requested lines by files"""
+    uniq_fl = {}
+    for file_idx in range(files):
+        filename = os.path.join(folder, f'log{file_idx}')
+        with open(filename, 'w') as f:
+            f.writelines(f'file {file_idx} line {line_idx} {"x" * 64}\n' for line_idx in range(1, lines + 1))
+        uniq_fl[filename] = {1, lines // 2, lines}
+    return uniq_fl
+
+
+def bench(uniq_fl, args, repeat):
+    params = app.parse_args(args)
+    t_start = time()
+    for _ in range(repeat):
+        app.fetch_files(uniq_fl, params)
+    return (time() - t_start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial vs parallel file reading benchmark')
+    parser.add_argument('-j', action="store", dest="jobs", type=int, default=os.cpu_count(), help='Workers count')
+    parser.add_argument('-l', action="store", dest="lines", type=int, default=20000, help='Lines per file')
+    parser.add_argument('-r', action="store", dest="repeat", type=int, default=3, help='Repeats per case')
+    params = parser.parse_args(sys.argv[1:])
+
+    modes = [
+        ('serial', []),
+        ('processes', ['-j', str(params.jobs)]),
+        ('threads', ['-j', str(params.jobs), '--threads']),
+        ('serial mmap', ['--mmap']),
+        ('processes mmap', ['--mmap', '-j', str(params.jobs)]),
+        ('threads mmap', ['--mmap', '-j', str(params.jobs), '--threads']),
+    ]
+    for files in (1, 10, 1000):
+        with TemporaryDirectory() as tmp:
+            uniq_fl = make_files(tmp, files, params.lines if files < 1000 else params.lines // 10)
+            for name, args in modes:
+                print(f'{files:>5} files  {name:<15} {bench(uniq_fl, args, params.repeat):.3f}s')
+        print()
+
+
+if __name__ == '__main__':
+    main()
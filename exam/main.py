@@ -1,30 +1,318 @@
-def main():
-    files_lines, files_content, uniq_fl = [], {}, {}
+import argparse
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+
+class LineIndex:
+    """
+    Random access to the lines of a file through an index of newline offsets.
+    The sidecar cache is a line of a JSON header followed by the raw offsets array"""
+    cache_suffix = '.idx'  # Sidecar index cache file suffix
+    tail_size = 4096  # Size of the indexed data tail used to detect appends
+
+    def __init__(self, filename, cache=False):
+        self._path = os.path.abspath(filename)
+        self._cachefile = self._path + self.cache_suffix
+        self._file = open(filename, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._size, self._mtime, self._inode = stat.st_size, stat.st_mtime_ns, stat.st_ino
+        # mmap can't map an empty file
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else b''
+        self._offsets = array('Q', [0])  # Offsets of the line beginnings
+        scanned = self._load() if cache else 0
+        if scanned < self._size:
+            self._scan(scanned)
+        if cache and scanned != self._size:
+            self._save()
+
+    def _tail_crc(self, size):
+        return zlib.crc32(self._mm[max(0, size - self.tail_size):size])
+
+    def _load(self):
+        """
+        Load the index from the sidecar cache and return the size of the file covered by it.
+        The cache is reused as is if the path, size, mtime and inode are the same
+        and is continued if the file has only been appended to."""
+        try:
+            with open(self._cachefile, 'rb') as db:
+                cache = json.loads(db.readline())
+                offsets = array('Q')
+                offsets.fromfile(db, cache['count'])
+            if cache['path'] != self._path or cache['inode'] != self._inode:
+                return 0
+            if cache['size'] > self._size or cache['tail_crc'] != self._tail_crc(cache['size']):
+                return 0
+            if cache['size'] == self._size and cache['mtime'] == self._mtime:
+                self._offsets = offsets
+                return self._size
+            if cache['size'] < self._size:
+                self._offsets = offsets
+                return cache['size']
+        except Exception:
+            """Missing, unreadable or broken cache means cold start"""
+            pass
+        return 0
+
+    def _save(self):
+        """Save the index to the sidecar cache file"""
+        cache = {
+            'path': self._path,
+            'size': self._size,
+            'mtime': self._mtime,
+            'inode': self._inode,
+            'tail_crc': self._tail_crc(self._size),
+            'count': len(self._offsets)
+        }
+        tmpfile = f'{self._cachefile}.{os.getpid()}'
+        try:
+            with open(tmpfile, 'wb') as db:
+                db.write(json.dumps(cache).encode() + b'\n')
+                self._offsets.tofile(db)
+            os.replace(tmpfile, self._cachefile)
+        except OSError:
+            """Cache is an optimization only, the index is still usable"""
+            if os.path.isfile(tmpfile):
+                os.remove(tmpfile)
+
+    def _scan(self, start):
+        """Add offsets of the lines which begin after the position 'start'"""
+        find, append = self._mm.find, self._offsets.append
+        pos = find(b'\n', start)
+        while pos != -1:
+            append(pos + 1)
+            pos = find(b'\n', pos + 1)
+
+    def __len__(self):
+        count = len(self._offsets)
+        return count - 1 if self._offsets[-1] == self._size else count
+
+    def line(self, lineno):
+        """Return the line with number 'lineno' (starting at 1) without surrounding whitespaces"""
+        if not 0 < lineno <= len(self):
+            raise IndexError(lineno)
+        start = self._offsets[lineno - 1]
+        end = self._offsets[lineno] if lineno < len(self._offsets) else self._size
+        return self._mm[start:end].decode().strip()
+
+    def close(self):
+        if self._size:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LineReader:
+    """Forward-only sequential reading of file lines, rewinds the file if an earlier line is requested"""
+
+    def __init__(self, filename):
+        self._file = open(filename, 'r')
+        self._lineno = 0  # Number of the last read line
+        self._line = ''
+
+    def line(self, lineno):
+        """Return the line with number 'lineno' (starting at 1) without surrounding whitespaces"""
+        if lineno < 1:
+            raise IndexError(lineno)
+        if lineno < self._lineno:
+            self._file.seek(0)
+            self._lineno = 0
+        while self._lineno < lineno:
+            line = self._file.readline()
+            if not line:
+                raise IndexError(lineno)
+            self._line = line
+            self._lineno += 1
+        return self._line.strip()
+
+    def close(self):
+        self._file.close()
+
+
+class QueryStream:
+    """
+    Answering queries by chunks which fit the memory budget.
+    Every chunk is read sorted by file and line for sequential I/O
+    and printed back in the input order."""
+    query_size = 200  # Approximate memory used by a query in a chunk besides the file name and the result line
+    open_files = 128  # Maximum number of simultaneously opened files
+
+    def __init__(self, params):
+        self._budget = params.memory * 2 ** 20
+        self._index = params.mmap or params.cache
+        self._cache = params.cache
+        self._readers = OrderedDict()
+        self._line_size = 80  # Average size of a result line, refined by every chunk
+
+    def _reader(self, filename):
+        """Return an opened reader of the file, closing the least recently used one if there are too many"""
+        if filename in self._readers:
+            self._readers.move_to_end(filename)
+        else:
+            if len(self._readers) >= self.open_files:
+                self._readers.popitem(last=False)[1].close()
+            self._readers[filename] = LineIndex(filename, self._cache) if self._index else LineReader(filename)
+        return self._readers[filename]
+
+    def _flush(self, chunk):
+        results = [None] * len(chunk)  # Reorder buffer
+        size = 0
+        for idx in sorted(range(len(chunk)), key=chunk.__getitem__):
+            file, lineno = chunk[idx]
+            results[idx] = self._reader(file).line(lineno)
+            size += len(results[idx])
+        self._line_size = size // len(chunk) or 1
+        for line in results:
+            print(line)
+
+    def run(self, queries):
+        chunk, used = [], 0
+        for file, lineno in queries:
+            chunk.append((file, lineno))
+            used += self.query_size + len(file) + self._line_size
+            if used >= self._budget:
+                self._flush(chunk)
+                chunk, used = [], 0
+        if chunk:
+            self._flush(chunk)
+
+    def close(self):
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+
+
+def read_queries():
+    """Read 'file lineno' pairs from the standard input until an empty or invalid line"""
     while True:
         try:
             file, lineno = [[file, int(lineno)] for file, lineno in [input().split()]][0]
         except:
             break
+        yield file, lineno
+
+
+def fetch_lines(filename, linenos):
+    """Read the lines with numbers from 'linenos' reading the file sequentially once"""
+    content = {}
+    uniq_lines = {lineno - 1 for lineno in linenos}
+    with open(filename, 'r') as s:
+        for lineidx, line in enumerate(s):
+            if lineidx not in uniq_lines:
+                continue
+            content[lineidx + 1] = line.strip()
+            uniq_lines.remove(lineidx)
+            if not uniq_lines:
+                break
+    return content
+
+
+def fetch_lines_mmap(filename, linenos, cache=False):
+    """Read the lines with numbers from 'linenos' through the memory-mapped file index"""
+    with LineIndex(filename, cache) as index:
+        return {lineno: index.line(lineno) for lineno in linenos if 0 < lineno <= len(index)}
+
+
+def fetch_files(uniq_fl, params):
+    """Read the requested lines of every file, in parallel if several jobs are allowed"""
+    if params.mmap or params.cache:
+        fetch = partial(fetch_lines_mmap, cache=params.cache)
+    else:
+        fetch = fetch_lines
+
+    if params.jobs <= 1 or len(uniq_fl) < 2:
+        return {filename: fetch(filename, linenos) for filename, linenos in uniq_fl.items()}
+
+    executor = ThreadPoolExecutor if params.threads else ProcessPoolExecutor
+    # Several files per task to not pay the process pool round trip for every small file
+    chunksize = max(1, len(uniq_fl) // (params.jobs * 4))
+    with executor(max_workers=params.jobs) as pool:
+        return dict(zip(uniq_fl, pool.map(fetch, uniq_fl.keys(), uniq_fl.values(), chunksize=chunksize)))
+
+
+def main(params=None):
+    if params is None:
+        params = parse_args([])
+
+    if params.stream:
+        stream = QueryStream(params)
+        try:
+            stream.run(read_queries())
+        finally:
+            stream.close()
+        return
+
+    files_lines, uniq_fl = [], {}
+    for file, lineno in read_queries():
         files_lines.append((file, lineno))
         if file not in uniq_fl:
             uniq_fl[file] = set()
-        uniq_fl[file].add(lineno - 1)
-
-    for filename in uniq_fl:
-        files_content[filename] = {}
-        uniq_lines = uniq_fl[filename]
-        with open(filename, 'r') as s:
-            for lineidx, line in enumerate(s):
-                if lineidx not in uniq_lines:
-                    continue
-                files_content[filename][lineidx + 1] = line.strip()
-                uniq_lines.remove(lineidx)
-                if not uniq_lines:
-                    break
+        uniq_fl[file].add(lineno)
+
+    files_content = fetch_files(uniq_fl, params)
 
     for file, lineno in files_lines:
         print(files_content[file][lineno])
 
 
+def parse_args(args):
+    parser = argparse.ArgumentParser(description='Print lines from files by "file lineno" pairs from stdin')
+    parser.add_argument(
+        '-m',
+        '--mmap',
+        action="store_true",
+        dest="mmap",
+        default=False,
+        help='Memory-map files and look lines up through an index of newline offsets.')
+    parser.add_argument(
+        '-c',
+        '--cache',
+        action="store_true",
+        dest="cache",
+        default=False,
+        help='Same as --mmap, but keep the line index in a sidecar <file>.idx between runs.')
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        action="store",
+        dest="jobs",
+        type=int,
+        default=1,
+        help='Number of worker processes reading files in parallel.')
+    parser.add_argument(
+        '-t',
+        '--threads',
+        action="store_true",
+        dest="threads",
+        default=False,
+        help='Use a thread pool instead of a process pool for --jobs.')
+    parser.add_argument(
+        '-s',
+        '--stream',
+        action="store_true",
+        dest="stream",
+        default=False,
+        help='Read queries by chunks fitting --memory and print the results chunk by chunk (--jobs is ignored).')
+    parser.add_argument(
+        '--memory',
+        action="store",
+        dest="memory",
+        type=int,
+        default=64,
+        help='Memory budget in megabytes for queries and results of a chunk in --stream mode.')
+    return parser.parse_args(args)
+
+
 if __name__ == '__main__':
-    main()
+    main(parse_args(sys.argv[1:]))
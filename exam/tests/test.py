@@ -1,4 +1,6 @@
+import os
 from io import StringIO
+from tempfile import TemporaryDirectory
 from unittest import TestCase, main, mock
 
 import main as app
@@ -6,32 +8,152 @@ import main as app
 
 class TestUtil(TestCase):
     @mock.patch('sys.stdout', new_callable=StringIO)
-    def main_handler(self, input_lines, mock_stdout):
+    def main_handler(self, input_lines, mock_stdout, args=()):
         with mock.patch('builtins.input', side_effect=input_lines):
-            app.main()
+            app.main(app.parse_args(list(args)))
         return mock_stdout.getvalue()
 
+    user_input = [
+        'log1 5',
+        'log1 7',
+        'log1 10',
+        'log2 12',
+        'log3 5',
+        'log1 7',
+        'log1 7',
+        'log1 7',
+        ''
+    ]
+    right_output = 'file 1 line 5\n' \
+                   'file 1 line 7\n' \
+                   'file 1 line 10\n' \
+                   'file 2 line 12\n' \
+                   'file 3 line 5\n' \
+                   'file 1 line 7\n' \
+                   'file 1 line 7\n' \
+                   'file 1 line 7\n'
+
     def test(self):
-        user_input = [
-            'log1 5',
-            'log1 7',
-            'log1 10',
-            'log2 12',
-            'log3 5',
-            'log1 7',
-            'log1 7',
-            'log1 7',
-            ''
-        ]
-        right_output = 'file 1 line 5\n' \
-                       'file 1 line 7\n' \
-                       'file 1 line 10\n' \
-                       'file 2 line 12\n' \
-                       'file 3 line 5\n' \
-                       'file 1 line 7\n' \
-                       'file 1 line 7\n' \
-                       'file 1 line 7\n'
-        self.assertEqual(self.main_handler(user_input), right_output)
+        self.assertEqual(self.main_handler(self.user_input), self.right_output)
+
+    def test_mmap(self):
+        self.assertEqual(self.main_handler(self.user_input, args=['--mmap']), self.right_output)
+
+    def test_jobs(self):
+        self.assertEqual(self.main_handler(self.user_input, args=['--jobs', '2']), self.right_output)
+        self.assertEqual(self.main_handler(self.user_input, args=['-j2', '--mmap']), self.right_output)
+
+    def test_jobs_threads(self):
+        self.assertEqual(self.main_handler(self.user_input, args=['-j2', '--threads']), self.right_output)
+
+    def test_stream(self):
+        self.assertEqual(self.main_handler(self.user_input, args=['--stream']), self.right_output)
+        self.assertEqual(self.main_handler(self.user_input, args=['--stream', '--mmap']), self.right_output)
+
+    def test_stream_invalid_line(self):
+        for lineno in ('0', '-3', '1000'):
+            with self.assertRaises(IndexError):
+                self.main_handler(['log1 5', 'log1 ' + lineno, ''], args=['--stream'])
+
+    def test_stream_chunks(self):
+        with mock.patch.object(app.QueryStream, 'query_size', 2 ** 18):
+            self.assertEqual(self.main_handler(self.user_input, args=['--stream', '--memory', '1']), self.right_output)
+            with mock.patch.object(app.QueryStream, 'open_files', 1):
+                self.assertEqual(self.main_handler(self.user_input, args=['-s', '--memory', '1']), self.right_output)
+
+    def test_cache(self):
+        try:
+            self.assertEqual(self.main_handler(self.user_input, args=['--cache']), self.right_output)
+            self.assertTrue(os.path.isfile('log1' + app.LineIndex.cache_suffix))
+            self.assertEqual(self.main_handler(self.user_input, args=['--cache']), self.right_output)
+        finally:
+            for filename in ('log1', 'log2', 'log3'):
+                if os.path.isfile(filename + app.LineIndex.cache_suffix):
+                    os.remove(filename + app.LineIndex.cache_suffix)
+
+
+class TestLineIndex(TestCase):
+    def index_handler(self, content):
+        with TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'log')
+            with open(filename, 'wb') as f:
+                f.write(content)
+            with app.LineIndex(filename) as index:
+                return [index.line(lineno) for lineno in range(1, len(index) + 1)]
+
+    def test_lines(self):
+        self.assertEqual(self.index_handler(b'a\nbb\r\n\nccc\n'), ['a', 'bb', '', 'ccc'])
+
+    def test_no_trailing_newline(self):
+        self.assertEqual(self.index_handler(b'a\nbb'), ['a', 'bb'])
+
+    def test_empty(self):
+        self.assertEqual(self.index_handler(b''), [])
+
+
+class TestLineReader(TestCase):
+    def test_rewind(self):
+        reader = app.LineReader('log1')
+        try:
+            self.assertEqual(reader.line(10), 'file 1 line 10')
+            self.assertEqual(reader.line(10), 'file 1 line 10')
+            self.assertEqual(reader.line(3), 'file 1 line 3')
+            self.assertEqual(reader.line(4), 'file 1 line 4')
+            self.assertRaises(IndexError, reader.line, 0)
+            self.assertRaises(IndexError, reader.line, -3)
+        finally:
+            reader.close()
+
+
+class TestLineIndexCache(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'log')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, content, mode='wb'):
+        with open(self.filename, mode) as f:
+            f.write(content)
+
+    def lines(self):
+        with app.LineIndex(self.filename, cache=True) as index:
+            return [index.line(lineno) for lineno in range(1, len(index) + 1)]
+
+    def test_reuse(self):
+        self.write(b'a\nb\n')
+        self.assertEqual(self.lines(), ['a', 'b'])
+        with mock.patch.object(app.LineIndex, '_scan') as scan:
+            self.assertEqual(self.lines(), ['a', 'b'])
+        scan.assert_not_called()
+
+    def test_append(self):
+        self.write(b'a\nb')
+        self.assertEqual(self.lines(), ['a', 'b'])
+        self.write(b'b\nc\n', 'ab')
+        with mock.patch.object(app.LineIndex, '_scan', autospec=True, side_effect=app.LineIndex._scan) as scan:
+            self.assertEqual(self.lines(), ['a', 'bb', 'c'])
+        self.assertEqual(scan.call_args[0][1], 3)
+
+    def test_broken(self):
+        self.write(b'a\nb\n')
+        self.assertEqual(self.lines(), ['a', 'b'])
+        cachefile = self.filename + app.LineIndex.cache_suffix
+        with open(cachefile, 'r+b') as f:
+            f.truncate(os.path.getsize(cachefile) - 1)
+        self.assertEqual(self.lines(), ['a', 'b'])
+        with open(cachefile, 'wb') as f:
+            f.write(b'\x80\x04garbage')
+        self.assertEqual(self.lines(), ['a', 'b'])
+
+    def test_rewrite(self):
+        self.write(b'a\nb\nc\n')
+        self.assertEqual(self.lines(), ['a', 'b', 'c'])
+        self.write(b'xx\nyy\n')
+        self.assertEqual(self.lines(), ['xx', 'yy'])
+        self.write(b'xx\nzz\nww\n')
+        self.assertEqual(self.lines(), ['xx', 'zz', 'ww'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import re
+import sys
+from random import choice, randint, seed
+from tempfile import TemporaryDirectory
+from time import process_time, time
+from unittest import mock
+
+import grep
+
+words = ['GET', 'POST', 'error', 'warning', 'info', 'user', 'request', 'timeout', 'mail', 'static', 'Error']
+
+
+def make_corpus(filename, size):
+    """Создание файла из случайных строк размером примерно size байт"""
+    seed(0)
+    written = 0
+    with open(filename, 'w') as f:
+        while written < size:
+            block = ''.join(
+                ' '.join(choice(words) for _ in range(randint(5, 15))) + '\n' for _ in range(10000))
+            block += f'request id=req-{written} done\n'  # Редкая строка, как искомый в логах идентификатор
+            f.write(block)
+            written += len(block)
+
+
+def legacy_match(lines, pattern, ignore_case):
+    """Проверка строк так, как это делалось до Matcher: re.search со строкой паттерна на каждой строке"""
+    for char in grep.re_match:
+        pattern = pattern.replace(char, grep.re_match[char])
+    count = 0
+    for line in lines:
+        if bool(re.search(pattern, line.rstrip(), re.IGNORECASE if ignore_case else 0)):
+            count += 1
+    return count
+
+
+def matcher_match(lines, pattern, ignore_case):
+    is_match = grep.Matcher(pattern, ignore_case).match
+    count = 0
+    for line in lines:
+        if is_match(line.rstrip()):
+            count += 1
+    return count
+
+
+def bench(func, filename, pattern, ignore_case):
+    with open(filename) as f:
+        lines_count = sum(1 for _ in f)
+        f.seek(0)
+        t_start = time()
+        func(f, pattern, ignore_case)
+        return lines_count / (time() - t_start)
+
+
+def bench_context(filename, args):
+    """Скорость grep() с контекстом, вывод отбрасывается"""
+    with open(filename) as f:
+        lines_count = sum(1 for _ in f)
+        f.seek(0)
+        t_start = time()
+        grep.grep(f, grep.parse_args(args))
+        return lines_count / (time() - t_start)
+
+
+def bench_binary(filename, args):
+    """Процессорное время grep() при чтении файла как стандартного входа в текстовом и binary режимах"""
+    times = []
+    for binary in (False, True):
+        with open(filename, 'rb') as f:
+            lines = grep.read_byte_lines(f) if binary else grep.read_lines(f)
+            t_start = process_time()
+            grep.grep(lines, grep.parse_args((['--binary'] if binary else []) + args))
+            times.append(process_time() - t_start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='grep matching speed benchmark')
+    parser.add_argument('-s', action="store", dest="size", type=int, default=1024, help='Corpus size in MB')
+    params = parser.parse_args(sys.argv[1:])
+
+    cases = [('error', False), ('error', True), ('req*out', False), ('t?me', True)]
+    with TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'corpus.txt')
+        make_corpus(filename, params.size * 2 ** 20)
+        for pattern, ignore_case in cases:
+            name = pattern + (' -i' if ignore_case else '')
+            before = bench(legacy_match, filename, pattern, ignore_case)
+            after = bench(matcher_match, filename, pattern, ignore_case)
+            print(f'{name:<12} before {before:>12,.0f} lines/s  after {after:>12,.0f} lines/s  x{after / before:.1f}')
+
+        # Редкие совпадения с большим контекстом: основная работа в буфере before context
+        with mock.patch.object(grep, 'output', lambda line: None):
+            for args in (['-B', '1000', 'timeout mail static'], ['-C', '1000', 'timeout mail static'],
+                         ['-A', '1000', 'timeout mail static']):
+                print(f'{" ".join(args[:2]):<12} {bench_context(filename, args):>12,.0f} lines/s')
+
+            # Редкие и частые совпадения
+            for args in (['-n', 'id=req-'], ['-c', 'id=req-'], ['-i', 'ID=REQ-'], ['-B', '5', 'id=req-'],
+                         ['-n', 'timeout mail static'], ['error'], ['-c', 'req*out']):
+                text, binary = bench_binary(filename, args)
+                print(f'{" ".join(args):<26} text {text:.2f}s  binary {binary:.2f}s  x{text / binary:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,13 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
 import sys
 import re
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 
 # Конвертации поддерживаемых специальных символов в формат RegExp
 re_match = {
@@ -11,6 +16,179 @@ re_match = {
     '?': '.'
 }
 
+output_batch = 1024  # Число строк, выводимых на экран за одну запись
+output_buffer = []  # Буфер строк для вывода на экран
+read_block = 1 << 20  # Размер блока при чтении стандартного входа
+chunk_size = 64 << 20  # Размер куска файла, обрабатываемого одной задачей пула
+select_batch = 512  # Число строк, разом проверяемых на возможность совпадения
+dense_batches = 8  # Число пачек, проверяемых построчно после пачки с частыми совпадениями
+
+# Результат обработки куска файла:
+# lines - число строк, count - число совпадений, records - (индекс, совпала ли, строка) выводимых строк,
+# head/tail - первые after и последние before строк, first/last - индексы первого и последнего совпадения
+Chunk = namedtuple('Chunk', 'lines count records head tail first last')
+
+# Специальные символы RegExp: паттерн без них ищется как обычная подстрока
+re_special = frozenset('.^$*+?{}[]\\|()')
+aho_corasick_min = 8  # Минимальное число паттернов-подстрок для поиска автоматом Ахо-Корасик
+
+
+def to_regexp(pattern):
+    """Конвертирование паттерна в формат RegExp"""
+    return ''.join(re_match.get(char, char) for char in pattern)
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик: поиск любой из подстрок за один проход по строке независимо от их числа"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]  # Переходы бора по символам
+        self._final = [False]  # Оканчивается ли в состоянии какой-либо из паттернов
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto[state][char] = len(self._goto)
+                    self._goto.append({})
+                    self._final.append(False)
+                state = self._goto[state][char]
+            self._final[state] = True
+
+        # Суффиксные ссылки строятся обходом бора в ширину
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._final[next_state] = self._final[next_state] or self._final[self._fail[next_state]]
+
+    def search(self, text):
+        """Есть ли в строке хотя бы один из паттернов"""
+        goto, fail, final = self._goto, self._fail, self._final
+        if final[0]:
+            return True
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if final[state]:
+                return True
+        return False
+
+
+class Matcher:
+    """
+    Паттерны, один раз скомпилированные в функцию проверки строки.
+    При binary строки - bytes, регистр при ignore_case не учитывается только для ASCII"""
+
+    def __init__(self, patterns, ignore_case=False, invert=False, binary=False):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        self.patterns = patterns
+        encode = str.encode if binary else str
+        fold = bytes.lower if binary else str.casefold
+        # Поиск по нескольким строкам, соединенным через '\n': множество номеров совпавших строк
+        # или None, если совпадений больше limit (None - такой поиск не поддерживается)
+        self.find_lines = None
+        if len(patterns) != 1:
+            self.match = self._multi(patterns, ignore_case, invert, encode, fold)
+            return
+        pattern = patterns[0]
+        if re_special.isdisjoint(pattern):
+            # Поиск подстроки без RegExp
+            if ignore_case:
+                self.match = self._literal_ignore_case(fold(encode(pattern)), invert, fold)
+            else:
+                self.match = self._literal(encode(pattern), invert)
+            if not invert and '\n' not in pattern:
+                self.find_lines = self._find_lines(
+                    fold(encode(pattern)) if ignore_case else encode(pattern), encode('\n'),
+                    fold if ignore_case else None)
+        else:
+            regexp = re.compile(encode(to_regexp(pattern)), re.IGNORECASE if ignore_case else 0)
+            self.match = self._regexp(regexp, invert)
+
+    @staticmethod
+    def _multi(patterns, ignore_case, invert, encode, fold):
+        """Строка совпадает, если совпадает хотя бы один из паттернов"""
+        literals = [fold(encode(pattern)) if ignore_case else encode(pattern)
+                    for pattern in patterns if re_special.isdisjoint(pattern)]
+        regexps = [encode(to_regexp(pattern)) for pattern in patterns if not re_special.isdisjoint(pattern)]
+
+        checks = []
+        if len(literals) >= aho_corasick_min:
+            search_literals = AhoCorasick(literals).search
+        else:
+            def search_literals(line):
+                return any(literal in line for literal in literals)
+        if literals and ignore_case:
+            checks.append(lambda line: search_literals(fold(line)))
+        elif literals:
+            checks.append(search_literals)
+        if regexps:
+            regexp = re.compile(
+                encode('|').join(encode('(?:') + regexp + encode(')') for regexp in regexps),
+                re.IGNORECASE if ignore_case else 0)
+            checks.append(lambda line: regexp.search(line) is not None)
+
+        def found(line):
+            return any(check(line) for check in checks)
+
+        if invert:
+            return lambda line: not found(line)
+        return found
+
+    @staticmethod
+    def _literal(pattern, invert):
+        if isinstance(pattern, bytes):
+            # Для bytes оператор in заметно медленнее find
+            find = bytes.find
+            if invert:
+                return lambda line: find(line, pattern) == -1
+            return lambda line: find(line, pattern) != -1
+        if invert:
+            return lambda line: pattern not in line
+        return lambda line: pattern in line
+
+    @staticmethod
+    def _literal_ignore_case(pattern, invert, fold):
+        if invert:
+            return lambda line: pattern not in fold(line)
+        return lambda line: pattern in fold(line)
+
+    @staticmethod
+    def _find_lines(pattern, newline, fold):
+        def find_lines(block, limit):
+            if fold:
+                block = fold(block)
+            found = set()
+            line_idx, scanned = 0, 0
+            pos = block.find(pattern)
+            while pos != -1:
+                if len(found) >= limit:
+                    return None
+                line_idx += block.count(newline, scanned, pos)
+                found.add(line_idx)
+                scanned = block.find(newline, pos)  # Конец строки с совпадением
+                if scanned == -1:
+                    break
+                pos = block.find(pattern, scanned + 1)
+            return found
+        return find_lines
+
+    @staticmethod
+    def _regexp(regexp, invert):
+        search = regexp.search
+        if invert:
+            return lambda line: search(line) is None
+        return lambda line: search(line) is not None
+
 
 def print_line(idx, char, line, params):
     """Отправка строки на печать с номером строки или без"""
@@ -21,93 +199,316 @@ def print_line(idx, char, line, params):
 
 
 def output(line):
-    """Вывод строки на экран"""
-    print(line)
+    """Вывод строки на экран пачками по output_batch строк"""
+    output_buffer.append(line)
+    if len(output_buffer) >= output_batch:
+        flush_output()
+
 
+def flush_output():
+    """Вывод на экран накопленных в буфере строк"""
+    if output_buffer:
+        output_buffer.append('')
+        sys.stdout.write('\n'.join(output_buffer))
+        output_buffer.clear()
 
-def match_line(line, params):
-    """Проверка строки на соответствие паттерну"""
-    r_value = bool(re.search(params.pattern, line, re.IGNORECASE if params.ignore_case else 0))
 
-    if params.invert:
-        r_value = not r_value
+def read_lines(stream, encoding='utf-8', block_size=read_block):
+    """Чтение строк из бинарного потока блоками по block_size байт с разбиением по переводам строк"""
+    tail = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        block = tail + block
+        cut = block.rfind(b'\n') + 1  # Неполная последняя строка переносится в следующий блок
+        tail = block[cut:]
+        if cut:
+            yield from block[:cut - 1].decode(encoding, 'replace').split('\n')
+    if tail:
+        yield tail.decode(encoding, 'replace')
 
-    return r_value
+
+def read_byte_lines(stream, block_size=read_block):
+    """Чтение строк без декодирования из бинарного потока блоками по block_size байт"""
+    tail = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = (tail + block).split(b'\n')
+        tail = lines.pop()  # Неполная последняя строка переносится в следующий блок
+        yield from lines
+    if tail:
+        yield tail
 
 
 def grep(lines, params):
-    # Конвертирование паттерна в формат RegExp
-    for char in re_match:
-        if char in params.pattern:
-            params.pattern = params.pattern.replace(char, re_match[char])
-
-    count = 0  # count - подсчёт числа совпадений (флаг -c)
-    prev_lines = []  # Буфер строк, предшествующих совпавшей в before context
-    prev_firstline_idx = -1  # Индекс строки, находящейся в начале буфера в before context
+    """Фильтрация строк из любого итератора, строки обрабатываются по одной"""
+    try:
+        _grep(lines, params)
+    finally:
+        flush_output()
+
+
+def _grep(lines, params):
+    # Паттерн компилируется один раз
+    matcher = Matcher(params.patterns, params.ignore_case, params.invert, params.binary)
+
+    # Вычисление числа строк, удовлетворяющих паттерну (флаг -c)
+    if params.count:
+        output(str(count_lines(lines, matcher)))
+        return
+
+    before, after = context_sizes(params)
     last_printed = -1  # последняя напечатанная строка для context'ов
-    to_print = 0  # число строк для вывода в after context
+    for line_idx, match, line in select_lines(lines, matcher, before, after):
+        # Разделитель между несмежными блоками контекста
+        if (before or after) and last_printed != -1 and line_idx - last_printed > 1:
+            output("--")
+        if params.binary:
+            line = line.decode('utf-8', 'replace')  # В binary режиме декодируются только выводимые строки
+        print_line(line_idx, ':' if match else '-', line, params)
+        last_printed = line_idx
 
-    if params.context:
-        params.before_context = params.before_context if params.before_context else params.context
-        params.after_context = params.after_context if params.after_context else params.context
 
-    for line_idx, line in enumerate(lines):
-        line = line.rstrip()
+def context_sizes(params):
+    """Число строк контекста до и после совпадения с учетом -C"""
+    return params.before_context or params.context, params.after_context or params.context
 
-        match = match_line(line, params)
 
-        if match:
-            # Вычисление числа строк, удовлетворяющих паттерну
-            if params.count:
-                count += 1
-                continue
+def match_batches(lines, matcher):
+    """
+    Разбиение строк на пачки по select_batch с номерами совпавших строк пачки.
+    Если паттерн позволяет, поиск идет сразу во всей пачке: для пачки без совпадений возвращается
+    пустое множество и необрезанные строки, для пачки с редкими совпадениями - их номера.
+    При частых совпадениях возвращается None, и строки проверяются по одной"""
+    find_lines = matcher.find_lines
+    dense = 0  # Число следующих пачек, которые проверяются построчно без поиска по пачке
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, select_batch))
+        if not batch:
+            return
+        if find_lines is None or dense:
+            dense = max(0, dense - 1)
+            yield [line.rstrip() for line in batch], None
+            continue
+        newline = b'\n' if isinstance(batch[0], bytes) else '\n'
+        limit = len(batch) // 8 + 1  # При частых совпадениях построчная проверка быстрее
+        # Сначала поиск по строкам как есть: если паттерна нет в них, то нет и в обрезанных
+        found = find_lines(newline.join(batch), limit)
+        if found is None:
+            dense = dense_batches
+        elif not found:
+            yield batch, found
+            continue
+        batch = [line.rstrip() for line in batch]
+        yield batch, found if found is None else find_lines(newline.join(batch), limit)
+
 
-            if params.before_context:
-                if last_printed != -1 and prev_lines and prev_firstline_idx - last_printed > 1:
-                    output("--")
+def count_lines(lines, matcher):
+    """Подсчет совпавших строк"""
+    is_match = matcher.match
+    count = 0
+    for batch, found in match_batches(lines, matcher):
+        count += len(found) if found is not None else sum(1 for line in batch if is_match(line))
+    return count
 
-                # Вывод предшествующих строк
-                if line_idx - last_printed > 1:
-                    for prev_line in prev_lines:
-                        print_line(prev_firstline_idx, '-', prev_line, params)
-                        prev_firstline_idx += 1
+
+def select_lines(lines, matcher, before=0, after=0):
+    """
+    Выбор совпавших строк и строк их контекста.
+    Возвращает кортежи (индекс, совпала ли строка, строка) в порядке следования строк.
+    Строки до совпадения хранятся в кольцевом буфере на before строк, после совпадения
+    печатается after строк, перекрывающиеся окна контекста объединяются."""
+    is_match = matcher.match
+    prev_lines = deque(maxlen=before)  # Кольцевой буфер строк-кандидатов в before context
+    to_print = 0  # число строк для вывода в after context
+    line_idx = 0
+    for batch, found in match_batches(lines, matcher):
+        if found is not None and not found:
+            # В пачке нет совпадений: выводится остаток after context, последние строки идут в before context
+            shown = min(to_print, len(batch))
+            for offset in range(shown):
+                yield line_idx + offset, False, batch[offset].rstrip()
+            to_print -= shown
+            if before:
+                prev_lines.extend(line.rstrip() for line in batch[max(shown, len(batch) - before):])
+            line_idx += len(batch)
+            continue
+
+        for offset, line in enumerate(batch):
+            if offset in found if found is not None else is_match(line):
+                if prev_lines:
+                    for prev_idx, prev_line in enumerate(prev_lines, line_idx - len(prev_lines)):
+                        yield prev_idx, False, prev_line
                     prev_lines.clear()
-                print_line(line_idx, ':', line, params)
-                last_printed = line_idx
-
-            if params.after_context:
-                if last_printed != -1 and line_idx - last_printed > 1:
-                    output("--")
-                if not params.before_context:
-                    print_line(line_idx, ':', line, params)
-                    last_printed = line_idx
-                to_print = params.after_context
-
-            if not (params.before_context or params.after_context):
-                print_line(line_idx, ':', line, params)
-        else:
-            if params.before_context:
+                yield line_idx, True, line
+                to_print = after
+            elif to_print:
+                yield line_idx, False, line
+                to_print -= 1
+            elif before:
                 prev_lines.append(line)
-                if len(prev_lines) == 1:
-                    prev_firstline_idx = line_idx
+            line_idx += 1
 
-                if len(prev_lines) > params.before_context:
-                    prev_firstline_idx += 1
-                    prev_lines.pop(0)
 
-            if params.after_context and to_print > 0:
-                    # Печатаем текущую строку в after_context
-                    # И удаляем её из буфера before_context
-                    if params.before_context:
-                        prev_lines.pop()
-                    print_line(line_idx, '-', line, params)
-                    last_printed = line_idx
-                    to_print -= 1
+def split_file(filename, size):
+    """Разбиение файла на куски размером около size байт по границам строк"""
+    file_size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        while bounds[-1] + size < file_size:
+            f.seek(bounds[-1] + size - 1)
+            f.readline()
+            if f.tell() >= file_size:
+                break
+            bounds.append(f.tell())
+    bounds.append(file_size)
+    return list(zip(bounds, bounds[1:]))
 
-    # end of for
 
+def grep_chunk(filename, start, end, params):
+    """Обработка куска файла с байта start до байта end, выполняется в процессе пула"""
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.split(b'\n') if params.binary else data.decode('utf-8', 'replace').split('\n')
+    if not lines[-1]:
+        lines.pop()
+
+    matcher = Matcher(params.patterns, params.ignore_case, params.invert, params.binary)
     if params.count:
-        output(str(count))
+        return Chunk(len(lines), count_lines(lines, matcher), [], [], [], None, None)
+
+    # В binary режиме декодируются только строки, которые могут быть выведены
+    text = partial(bytes.decode, encoding='utf-8', errors='replace') if params.binary else str
+    before, after = context_sizes(params)
+    records = [(idx, match, text(line)) for idx, match, line in select_lines(lines, matcher, before, after)]
+    matches = [record[0] for record in records if record[1]]
+    return Chunk(
+        len(lines),
+        len(matches),
+        records,
+        [text(line.rstrip()) for line in lines[:after]],
+        [text(line.rstrip()) for line in lines[max(0, len(lines) - before):]] if before else [],
+        matches[0] if matches else None,
+        matches[-1] if matches else None
+    )
+
+
+class ChunksPrinter:
+    """Вывод результатов кусков файла так, как если бы файл просматривался целиком"""
+
+    def __init__(self, params, with_filename):
+        self._params = params
+        self._before, self._after = context_sizes(params)
+        self._with_filename = with_filename
+        self._printed = False  # Был ли вывод по предыдущим файлам
+
+    def start_file(self, filename):
+        self._filename = filename
+        self._offset = 0  # Индекс первой строки текущего куска в файле
+        self._count = 0
+        self._last_printed = -1  # последняя напечатанная строка файла
+        self._after_end = -1  # последняя строка after context совпадений предыдущих кусков
+        self._prev_tail = deque(maxlen=self._before)  # (индекс, строка) последних строк предыдущих кусков
+
+    def finish_file(self):
+        if self._params.count:
+            output(self._prefix(':') + str(self._count))
+
+    def _prefix(self, char):
+        return self._filename + char if self._with_filename else ''
+
+    def _print(self, idx, match, line):
+        if idx <= self._last_printed:
+            return
+        if self._before or self._after:
+            if self._last_printed == -1 and self._printed or self._last_printed != -1 and idx - self._last_printed > 1:
+                output("--")
+        char = ':' if match else '-'
+        out_str = self._prefix(char)
+        if self._params.line_number:
+            out_str += str(idx + 1) + char
+        output(out_str + line)
+        self._last_printed = idx
+        self._printed = True
+
+    def add(self, chunk):
+        offset = self._offset
+        self._count += chunk.count
+
+        # before context первого совпадения, попадающий в предыдущие куски
+        if chunk.first is not None:
+            for idx, line in self._prev_tail:
+                if idx >= offset + chunk.first - self._before:
+                    self._print(idx, False, line)
+
+        # after context последнего совпадения предыдущих кусков, попадающий в начало этого куска
+        head = chunk.head[:max(0, self._after_end - offset + 1)]
+        head_idx = 0
+        for idx, match, line in chunk.records:
+            while head_idx < min(idx, len(head)):
+                self._print(offset + head_idx, False, head[head_idx])
+                head_idx += 1
+            self._print(offset + idx, match, line)
+        for head_idx in range(head_idx, len(head)):
+            self._print(offset + head_idx, False, head[head_idx])
+
+        if chunk.last is not None:
+            self._after_end = max(self._after_end, offset + chunk.last + self._after)
+        tail_start = offset + chunk.lines - len(chunk.tail)
+        self._prev_tail.extend((tail_start + idx, line) for idx, line in enumerate(chunk.tail))
+        self._offset += chunk.lines
+
+
+def expand_paths(paths, recursive):
+    """Список файлов для поиска, каталоги обходятся при recursive"""
+    for path in paths:
+        if os.path.isdir(path):
+            if not recursive:
+                print(f'grep: {path}: Is a directory', file=sys.stderr)
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    yield os.path.join(root, filename)
+        elif os.path.isfile(path):
+            yield path
+        else:
+            print(f'grep: {path}: No such file or directory', file=sys.stderr)
+
+
+def grep_files(paths, params):
+    """Поиск по файлам, куски файлов обрабатываются параллельно в пуле процессов"""
+    tasks = [
+        (filename, start, end)
+        for filename in expand_paths(paths, params.recursive)
+        for start, end in split_file(filename, chunk_size) or [(0, 0)]
+    ]
+    if not tasks:
+        return
+    with_filename = params.with_filename or params.recursive or len(paths) > 1
+    printer = ChunksPrinter(params, with_filename)
+    worker = partial(grep_chunk, params=params)
+
+    # Пул не нужен для одной задачи: его запуск дольше поиска в небольшом файле
+    pool = ProcessPoolExecutor(max_workers=params.jobs) if params.jobs > 1 and len(tasks) > 1 else None
+    try:
+        results = pool.map(worker, *zip(*tasks)) if pool else map(worker, *zip(*tasks))
+        for task_idx, ((filename, start, end), chunk) in enumerate(zip(tasks, results)):
+            if start == 0:
+                if task_idx:
+                    printer.finish_file()
+                printer.start_file(filename)
+            printer.add(chunk)
+        printer.finish_file()
+    finally:
+        flush_output()
+        if pool:
+            pool.shutdown()
 
 
 def parse_args(args):
@@ -149,13 +550,74 @@ def parse_args(args):
         type=int,
         default=0,
         help='Print num lines of leading context before each match.')
-    parser.add_argument('pattern', action="store", help='Search pattern. Can contain magic symbols: ?*')
-    return parser.parse_args(args)
+    parser.add_argument(
+        '-r',
+        action="store_true",
+        dest="recursive",
+        default=False,
+        help='Recursively search subdirectories listed.')
+    parser.add_argument(
+        '-H',
+        action="store_true",
+        dest="with_filename",
+        default=False,
+        help='Always print filename headers with output lines.')
+    parser.add_argument(
+        '-j',
+        action="store",
+        dest="jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of worker processes searching files and chunks of large files.')
+    parser.add_argument(
+        '-e',
+        action="append",
+        dest="patterns",
+        default=[],
+        help='Specify a pattern used during the search of the input. May be used several times.')
+    parser.add_argument(
+        '-f',
+        action="append",
+        dest="pattern_files",
+        default=[],
+        help='Read one or more newline separated patterns from file.')
+    parser.add_argument(
+        '--binary',
+        action="store_true",
+        dest="binary",
+        default=False,
+        help='Match raw bytes of lines, decode only printed lines.')
+    parser.add_argument(
+        'pattern', action="store", nargs='?', help='Search pattern. Can contain magic symbols: ?*')
+    parser.add_argument('files', action="store", nargs='*', help='Files or directories (with -r) to search in.')
+    params = parser.parse_args(args)
+
+    if params.patterns or params.pattern_files:
+        # С -e и -f все позиционные аргументы - файлы
+        if params.pattern is not None:
+            params.files.insert(0, params.pattern)
+            params.pattern = None
+        for pattern_file in params.pattern_files:
+            try:
+                with open(pattern_file) as f:
+                    params.patterns.extend(line.rstrip('\n') for line in f)
+            except OSError as e:
+                parser.error(f'{e.strerror} \'{pattern_file}\'')
+    elif params.pattern is None:
+        parser.error('the following arguments are required: pattern')
+    else:
+        params.patterns = [params.pattern]
+    return params
 
 
 def main():
     params = parse_args(sys.argv[1:])
-    grep(sys.stdin.readlines(), params)
+    if params.files:
+        grep_files(params.files, params)
+    elif params.binary:
+        grep(read_byte_lines(sys.stdin.buffer), params)
+    else:
+        grep(read_lines(sys.stdin.buffer, sys.stdin.encoding), params)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,8 @@
 
-from unittest import TestCase
+import os
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
 
 import grep
 
@@ -10,6 +13,7 @@ def save_to_list(line):
     lst.append(line)
 
 
+grep_output = grep.output
 grep.output = save_to_list
 
 class GrepBaseTest(TestCase):
@@ -501,3 +505,288 @@ class GrepContextMyTests2(TestCase):
         params = grep.parse_args(['???', '-B1', '-n' , '-A2'])
         grep.grep(self.lines, params)
         self.assertEqual(lst, ['1-vr', '2:baab', '3:abbb', '4-fc', '5-fc', '6-fc', '7:bbb', '8-cc', '9-cc'])
+
+class GrepMatcherTests(TestCase):
+
+    lines = ['a.b', 'axb', 'Straße', 'A*B']
+
+    def tearDown(self):
+        global lst
+        lst.clear()
+
+    def test_literal(self):
+        self.assertTrue(grep.Matcher('ab').match('cabc'))
+        self.assertFalse(grep.Matcher('ab').match('cAbc'))
+        self.assertTrue(grep.Matcher('ab', ignore_case=True).match('cAbc'))
+        self.assertTrue(grep.Matcher('ab', invert=True).match('cAbc'))
+        self.assertFalse(grep.Matcher('ab', ignore_case=True, invert=True).match('cAbc'))
+
+    def test_regexp_chars(self):
+        params = grep.parse_args(['a.b'])
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['a.b', 'axb'])
+
+    def test_ignore_case(self):
+        params = grep.parse_args(['-i', 'STRASSE'])
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['Straße'])
+
+    def test_params_reuse(self):
+        params = grep.parse_args(['-i', 'a*b'])
+        grep.grep(self.lines, params)
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['a.b', 'axb', 'A*B'] * 2)
+        self.assertEqual(params.pattern, 'a*b')
+
+class GrepStreamTests(TestCase):
+
+    def test_read_lines(self):
+        data = 'вр\nbaab\n\nабвгд\nlast'.encode()
+        for block_size in (1, 2, 3, 5, 100):
+            lines = list(grep.read_lines(BytesIO(data), block_size=block_size))
+            self.assertEqual(lines, ['вр', 'baab', '', 'абвгд', 'last'])
+
+    def test_read_lines_newline_end(self):
+        self.assertEqual(list(grep.read_lines(BytesIO(b'a\r\nb\n'), block_size=2)), ['a\r', 'b'])
+        self.assertEqual(list(grep.read_lines(BytesIO(b''))), [])
+
+    def test_output_batches(self):
+        params = grep.parse_args(['-n', 'b'])
+        with mock.patch('sys.stdout', new_callable=StringIO) as stdout, \
+                mock.patch.object(grep, 'output', grep_output), mock.patch.object(grep, 'output_batch', 2):
+            grep.grep(iter(['baab', 'bbb', 'ccc', 'b']), params)
+            self.assertEqual(stdout.getvalue(), '1:baab\n2:bbb\n4:b\n')
+
+
+class GrepContextWindowsTests(TestCase):
+
+    lines = ['m', 'x', 'x', 'm', 'x', 'x', 'x', 'x', 'm', 'm', 'x', 'x', 'x', 'x', 'x', 'x', 'm', 'x']
+
+    def tearDown(self):
+        global lst
+        lst.clear()
+
+    def reference(self, before, after):
+        """Объединение окон [совпадение - before, совпадение + after] с разделителями между блоками"""
+        matches = [idx for idx, line in enumerate(self.lines) if line == 'm']
+        printed = sorted({
+            idx for match in matches for idx in range(max(0, match - before), min(len(self.lines), match + after + 1))})
+        out = []
+        for pos, idx in enumerate(printed):
+            if pos and idx - printed[pos - 1] > 1 and (before or after):
+                out.append('--')
+            out.append(f'{idx + 1}{":" if idx in matches else "-"}{self.lines[idx]}')
+        return out
+
+    def test_overlapping_windows(self):
+        for before in range(6):
+            for after in range(6):
+                grep.grep(self.lines, grep.parse_args(['-n', '-B', str(before), '-A', str(after), 'm']))
+                self.assertEqual(lst, self.reference(before, after), f'-B{before} -A{after}')
+                lst.clear()
+
+    def test_context_overlapping_windows(self):
+        for context in range(6):
+            grep.grep(self.lines, grep.parse_args(['-n', '-C', str(context), 'm']))
+            self.assertEqual(lst, self.reference(context, context), f'-C{context}')
+            lst.clear()
+
+    def test_context_with_before_after(self):
+        grep.grep(self.lines, grep.parse_args(['-n', '-C1', '-B3', 'm']))
+        self.assertEqual(lst, self.reference(3, 1))
+        lst.clear()
+        grep.grep(self.lines, grep.parse_args(['-n', '-C1', '-A3', 'm']))
+        self.assertEqual(lst, self.reference(1, 3))
+
+    def test_large_before(self):
+        lines = ['x'] * 5000 + ['m'] + ['x'] * 5000 + ['m']
+        grep.grep(lines, grep.parse_args(['-n', '-B', '1000', 'm']))
+        self.assertEqual(len(lst), 2 * 1001 + 1)
+        self.assertEqual(lst[:2], ['4001-x', '4002-x'])
+        self.assertEqual(lst[1000:1003], ['5001:m', '--', '9002-x'])
+        self.assertEqual(lst[-1], '10002:m')
+
+    def test_params_not_changed(self):
+        params = grep.parse_args(['-C2', 'm'])
+        grep.grep(self.lines, params)
+        self.assertEqual((params.before_context, params.after_context, params.context), (0, 0, 2))
+
+
+class GrepMultiPatternTests(TestCase):
+
+    lines = ['req-1 ok', 'req-2 fail', 'REQ-3 ok', 'other', 'req-10 retry']
+
+    def tearDown(self):
+        global lst
+        lst.clear()
+
+    def test_patterns(self):
+        params = grep.parse_args(['-e', 'req-1', '-e', 'other'])
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['req-1 ok', 'other', 'req-10 retry'])
+
+    def test_patterns_wildcard(self):
+        params = grep.parse_args(['-n', '-e', 'r?q-2', '-e', 'oth*r', '-e', 'retry'])
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['2:req-2 fail', '4:other', '5:req-10 retry'])
+
+    def test_patterns_ignore_case_invert(self):
+        params = grep.parse_args(['-i', '-v', '-e', 'req-3', '-e', 'fail'])
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['req-1 ok', 'other', 'req-10 retry'])
+
+    def test_pattern_file(self):
+        with TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'patterns.txt')
+            with open(filename, 'w') as f:
+                f.write('\n'.join(f'req-{idx} ' for idx in range(3, 100)) + '\n')
+            params = grep.parse_args(['-c', '-i', '-f', filename, '-e', 'fail'])
+        grep.grep(self.lines, params)
+        self.assertEqual(lst, ['3'])
+
+    def test_positional_files(self):
+        params = grep.parse_args(['-e', 'a', 'file1', 'file2'])
+        self.assertEqual((params.patterns, params.files), (['a'], ['file1', 'file2']))
+
+    def test_aho_corasick(self):
+        patterns = ['he', 'she', 'his', 'hers', 'ushe', 'rs', 'ab', 'bab', 'babc', 'c']
+        for text in ['', 'ushers', 'hi', 'ahishe', 'aaab', 'bbba', 'xbabx', 'bca', 'hr', 'sh', 'usher']:
+            for count in range(1, len(patterns) + 1):
+                self.assertEqual(
+                    grep.AhoCorasick(patterns[:count]).search(text),
+                    any(pattern in text for pattern in patterns[:count]),
+                    f'{patterns[:count]} {text}')
+
+    def test_aho_corasick_empty_pattern(self):
+        self.assertTrue(grep.AhoCorasick(['abc', '']).search('x'))
+        self.assertFalse(grep.AhoCorasick([]).search('x'))
+
+    def test_many_literals(self):
+        patterns = [f'id{idx:04}' for idx in range(1000)]
+        matcher = grep.Matcher(patterns + ['x?y'], ignore_case=True)
+        self.assertTrue(matcher.match('request ID0999 done'))
+        self.assertTrue(matcher.match('x-y'))
+        self.assertFalse(matcher.match('request id1000 done'))
+
+
+class GrepBinaryTests(TestCase):
+
+    lines = ['vr', 'baab', 'abbb', 'fc', 'fc', 'fc', 'bbb', 'cc', 'cc', 'cc', 'Cc']
+
+    def tearDown(self):
+        global lst
+        lst.clear()
+
+    def test_same_as_text(self):
+        for args in (['b'], ['-v', 'b'], ['-c', '-i', 'c'], ['-n', '-C1', '???'], ['-n', 'b*?b', '-A2'],
+                     ['-i', '-e', 'CC', '-e', 'vr'], ['-e', 'x', '-e', 'b?b'] + [f'-ep{idx}' for idx in range(10)]):
+            grep.grep(self.lines, grep.parse_args(args))
+            expected = list(lst)
+            lst.clear()
+            grep.grep([line.encode() for line in self.lines], grep.parse_args(['--binary'] + args))
+            self.assertEqual(lst, expected, args)
+            lst.clear()
+
+    def test_batches(self):
+        lines = ['cc', 'x'] * 20 + ['x'] * 20 + ['bcc'] + ['x'] * 20
+        for args in (['-n', 'cc'], ['-c', 'cc'], ['-C2', 'cc'], ['-B3', '-i', 'BC']):
+            grep.grep(lines, grep.parse_args(args))
+            expected = list(lst)
+            lst.clear()
+            with mock.patch.object(grep, 'select_batch', 5), mock.patch.object(grep, 'dense_batches', 2):
+                for binary in (False, True):
+                    grep.grep([line.encode() for line in lines] if binary else lines,
+                              grep.parse_args((['--binary'] if binary else []) + args))
+                    self.assertEqual(lst, expected, args)
+                    lst.clear()
+
+    def test_decode_printed(self):
+        params = grep.parse_args(['--binary', '-n', 'ab'])
+        grep.grep(['вр ab\n'.encode(), b'\xff ab\r\n', b'cd\n'], params)
+        self.assertEqual(lst, ['1:вр ab', '2:\ufffd ab'])
+
+    def test_read_byte_lines(self):
+        data = 'вр\nbaab\n\nабвгд\nlast'.encode()
+        for block_size in (1, 2, 3, 100):
+            lines = list(grep.read_byte_lines(BytesIO(data), block_size=block_size))
+            self.assertEqual(lines, [line.encode() for line in ['вр', 'baab', '', 'абвгд', 'last']])
+
+    def test_files(self):
+        with TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'log')
+            with open(filename, 'w') as f:
+                f.write('\n'.join(self.lines) + '\n')
+            grep.grep(self.lines, grep.parse_args(['-n', '-C1', 'bbb']))
+            expected = list(lst)
+            lst.clear()
+            with mock.patch.object(grep, 'chunk_size', 7):
+                grep.grep_files([filename], grep.parse_args(['--binary', '-j', '1', '-n', '-C1', 'bbb']))
+        self.assertEqual(lst, expected)
+
+
+class GrepFilesTests(TestCase):
+
+    lines = ['vr', 'baab', 'abbb', 'fc', 'fc', 'fc', 'bbb', 'cc', 'cc', 'cc', 'cc']
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, 'sub'))
+        self.file = self.write('log', self.lines)
+        self.subfile = self.write(os.path.join('sub', 'log'), ['abc', 'zz'])
+
+    def tearDown(self):
+        global lst
+        lst.clear()
+        self.tmp.cleanup()
+
+    def write(self, name, lines):
+        filename = os.path.join(self.tmp.name, name)
+        with open(filename, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return filename
+
+    def test_chunks(self):
+        for args in (['b'], ['-c', 'b'], ['-n', 'b', '-A1'], ['b', '-B2', '-n', '-v'], ['???', '-C1', '-n'],
+                     ['bbb', '-C1', '-n', '-A2'], ['???', '-B1', '-n', '-A2'], ['a', '-C3']):
+            grep.grep(self.lines, grep.parse_args(args))
+            expected = list(lst)
+            for size in range(1, 40):
+                lst.clear()
+                with mock.patch.object(grep, 'chunk_size', size):
+                    grep.grep_files([self.file], grep.parse_args(args + ['-j', '1']))
+                self.assertEqual(lst, expected, f'{args} chunk size {size}')
+            lst.clear()
+
+    def test_pool(self):
+        with mock.patch.object(grep, 'chunk_size', 5):
+            grep.grep_files([self.file], grep.parse_args(['-n', '-C1', 'bbb', '-j', '2']))
+        self.assertEqual(lst, ['2-baab', '3:abbb', '4-fc', '--', '6-fc', '7:bbb', '8-cc'])
+
+    def test_pool__single_task(self):
+        with mock.patch.object(grep, 'ProcessPoolExecutor') as pool:
+            grep.grep_files([self.file], grep.parse_args(['-n', 'bbb', '-j', '4']))
+        pool.assert_not_called()
+        self.assertEqual(lst, ['3:abbb', '7:bbb'])
+
+    def test_jobs__default(self):
+        with mock.patch('os.cpu_count', return_value=None):
+            self.assertEqual(1, grep.parse_args(['bbb']).jobs)
+
+    def test_with_filename(self):
+        grep.grep_files([self.file], grep.parse_args(['-H', '-n', '-A1', 'vr']))
+        self.assertEqual(lst, [self.file + ':1:vr', self.file + '-2-baab'])
+
+    def test_recursive(self):
+        grep.grep_files([self.tmp.name], grep.parse_args(['-r', '-B1', 'ab']))
+        self.assertEqual(lst, [
+            self.file + '-vr', self.file + ':baab', self.file + ':abbb', '--', self.subfile + ':abc'])
+
+    def test_count_files(self):
+        grep.grep_files([self.file, self.subfile], grep.parse_args(['-c', 'ab']))
+        self.assertEqual(lst, [self.file + ':2', self.subfile + ':1'])
+
+    def test_directory_without_recursive(self):
+        with mock.patch('sys.stderr', new_callable=StringIO) as stderr:
+            grep.grep_files([self.tmp.name], grep.parse_args(['ab']))
+        self.assertEqual(lst, [])
+        self.assertIn('Is a directory', stderr.getvalue())
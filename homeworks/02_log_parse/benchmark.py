@@ -0,0 +1,118 @@
+# -*- encoding: utf-8 -*-
+
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import tracemalloc
+from random import choice, randint, random, seed
+from tempfile import TemporaryDirectory
+from time import time
+
+from log_parse import aggregate, parse
+
+hosts = ['mail.ru', 'www.mail.ru', 'sys.mail.ru', 'www.sys.mail.ru', 'corp.mail.ru']
+paths = ['/', '/calendar/config/254/', '/fitness/pay_list/', '/static/css/reset.css', '/static/js/auth.js']
+methods = ['GET', 'GET', 'GET', 'POST', 'PUT']
+
+
+def make_log(filename, lines, unique=0.0):
+    """
+    Create a synthetic log with 'lines' lines, about 50 requests per second and some non-log lines.
+    The 'unique' part of requests have a unique ID in the path"""
+    seed(0)
+    with open(filename, 'w') as f:
+        for block_start in range(0, lines, 10000):
+            block = []
+            for idx in range(block_start, min(lines, block_start + 10000)):
+                if idx % 100 == 99:
+                    block.append('Traceback (most recent call last):\n')
+                    continue
+                second = idx // 50
+                url_path = '/item/{}/'.format(idx) if unique and random() < unique else choice(paths)
+                block.append('[{:02d}/Mar/2018 {:02d}:{:02d}:{:02d}] "{} https://{}{} HTTP/1.1" {} {}\n'.format(
+                    1 + second // 86400 % 28, second // 3600 % 24, second // 60 % 60, second % 60,
+                    choice(methods), choice(hosts), url_path, choice([200, 200, 301, 404, 500]),
+                    randint(0, 5000)))
+            f.writelines(block)
+
+
+def bench(lines, params):
+    t_start = time()
+    parse(**params)
+    return lines / (time() - t_start)
+
+
+def bench_hitters(lines, capacity):
+    """Time, peak memory and TOP-5 of the exact counting or of heavy_hitters with the given capacity"""
+    tracemalloc.start()
+    t_start = time()
+    top = parse(heavy_hitters=capacity)
+    elapsed = time() - t_start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description='log_parse.parse() speed benchmark')
+    parser.add_argument('-l', action="store", dest="lines", type=int, default=10 ** 7, help='Log lines count')
+    parser.add_argument('-j', action="store", dest="jobs", type=int, default=os.cpu_count(), help='Worker processes')
+    params = parser.parse_args(sys.argv[1:])
+
+    cases = [
+        ('default', {}),
+        ('slow_queries', {'slow_queries': True}),
+        ('start_at', {'start_at': '01/Mar/2018 12:00:00'}),
+        ('start_at stop_at', {'start_at': '01/Mar/2018 12:00:00', 'stop_at': '02/Mar/2018 12:00:00'}),
+        (f'default -j {params.jobs}', {'jobs': params.jobs}),
+        (f'slow_queries -j {params.jobs}', {'slow_queries': True, 'jobs': params.jobs}),
+        ('gzip', {'log_files': 'log.log.gz'}),
+        ('percentiles', {'percentiles': [50, 95, 99]}),
+        ('columnar', {'columnar': True}),
+        ('columnar slow_queries', {'columnar': True, 'slow_queries': True}),
+        ('columnar start_at', {'columnar': True, 'start_at': '01/Mar/2018 12:00:00'}),
+        ('10 minutes', {'start_at': '01/Mar/2018 01:00:00', 'stop_at': '01/Mar/2018 01:10:00'}),
+        ('time_index build', {'time_index': True, 'start_at': '01/Mar/2018 01:00:00'}),
+        ('time_index 10 minutes', {'time_index': True, 'start_at': '01/Mar/2018 01:00:00',
+                                   'stop_at': '01/Mar/2018 01:10:00'}),
+        ('cache build', {'cache': True}),
+        ('cache', {'cache': True}),
+        ('cache slow_queries', {'cache': True, 'slow_queries': True}),
+        ('cache start_at', {'cache': True, 'start_at': '01/Mar/2018 12:00:00'}),
+    ]
+    cwd = os.getcwd()
+    with TemporaryDirectory() as tmp:
+        # parse() reads log.log from the current directory
+        os.chdir(tmp)
+        try:
+            make_log('log.log', params.lines)
+            with open('log.log', 'rb') as src, gzip.open('log.log.gz', 'wb', compresslevel=1) as dst:
+                shutil.copyfileobj(src, dst)
+            for name, case in cases:
+                print(f'{name:<24} {bench(params.lines, case):>12,.0f} lines/s')
+
+            # Four group-bys in one pass vs a separate pass for every group
+            group_by = ['host', 'code', 'method', 'minute']
+            t_start = time()
+            aggregate(group_by)
+            one_pass = time() - t_start
+            t_start = time()
+            for fields in group_by:
+                aggregate([fields])
+            print(f'aggregate {len(group_by)} groups      one pass {one_pass:.1f}s  '
+                  f'separate passes {time() - t_start:.1f}s')
+
+            # Accuracy and memory of heavy_hitters on a log with unique IDs in 70% of paths
+            make_log('log.log', params.lines, unique=0.7)
+            for capacity in (None, 100, 1000, 10000):
+                elapsed, peak, top = bench_hitters(params.lines, capacity)
+                print(f'{"exact" if capacity is None else f"heavy_hitters={capacity}":<22} {elapsed:6.1f}s  '
+                      f'peak {peak / 2 ** 20:8.1f} MB  top {top}')
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,93 @@
 # -*- encoding: utf-8 -*-
 
+import bz2
+import gzip
+import io
+import json
+import lzma
+import mmap
+import operator
+import os
+import pickle
+import queue
 import re
+import sys
+import threading
+import zlib
+from glob import glob, escape as glob_escape
+from itertools import chain, compress, islice
 from os import path
 from types import SimpleNamespace
+from array import array
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from heapq import nlargest
+from math import ceil, log as math_log
 from urllib import parse as urlparse
-from time import strptime
+from calendar import timegm
+from time import sleep, strptime
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # The columnar mode filters and aggregates columns in pure Python
+
+# Log line fields and their patterns
+log_fields = (
+    ('request_date', r'\d{1,2}/\w+/\d{4}'),
+    ('request_time', r'\d{1,2}:\d{1,2}:\d{1,2}'),
+    ('request_type', r'\w+'),
+    ('request_url', r'.*'),
+    ('request_protocol', r'.*'),
+    ('response_code', r'\d+'),
+    ('response_time', r'\d+')
+)
+log_template = r'^\[{}[ ]{}][ ]\"{}[ ]{}[ ]{}\"[ ]{}[ ]{}'
+re_log = re.compile(log_template.format(*('({})'.format(pattern) for name, pattern in log_fields)))
+date_format = '%d/%b/%Y %H:%M:%S'
+chunk_size = 64 * 2 ** 20  # Max size of a log file chunk parsed by a worker process
+openers = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}  # Streaming decompression by file extension
+read_block = 2 ** 16  # Approximate size of lines passed at once by the reader thread
+read_queue = 16  # Max number of read blocks waiting for parsing
+columnar_block = 2 ** 16  # Number of lines parsed at once in the columnar mode
+columnar_read = 2 ** 22  # Size in characters of a block read from a plain log file in the columnar mode
+
+
+def log_regexp(fields):
+    """Log line pattern capturing only the given fields, matches log lines in a block of lines"""
+    return re.compile(log_template.format(*(
+        ('({})' if name in fields else '(?:{})').format(pattern) for name, pattern in log_fields)), re.MULTILINE)
+
+
+@lru_cache(maxsize=4096)
+def parse_datetime(value):
+    """Parsing of a log timestamp, cached as many lines share the same second"""
+    return strptime(value, date_format)
 
-def parse_url(log, args):
-    """URL parsing in parameters dependence"""
-    url_items = urlparse.urlsplit(log.request_url)
+
+def url_key(request_url, args):
+    """URL of a request to count, False for an ignored file"""
+    url_items = urlparse.urlsplit(request_url)
 
     if args.ignore_files and url_items.path.split('/')[-1] != '':
         return False
 
     if args.ignore_www and url_items.hostname[:3] == 'www':
-        r_value = url_items.hostname[4:] + url_items.path
-    else:
-        r_value = url_items.hostname + url_items.path
+        return url_items.hostname[4:] + url_items.path
+    return url_items.hostname + url_items.path
+
+
+def parse_url(log, args):
+    """URL parsing in parameters dependence"""
+    r_value = url_key(log.request_url, args)
+    if not r_value:
+        return False
 
     if args.start_at or args.stop_at:
-        date_format = '%d/%b/%Y %H:%M:%S'
-        start_datetime = strptime(args.start_at, date_format) if args.start_at else False
-        end_datetime = strptime(args.stop_at, date_format) if args.stop_at else False
-        log_datetime = strptime(log.request_date + " " + log.request_time, date_format)
+        start_datetime = args.start_datetime
+        end_datetime = args.stop_datetime
+        log_datetime = parse_datetime(log.request_date + " " + log.request_time)
 
         if args.start_at:
             if args.stop_at and not (start_datetime <= log_datetime <= end_datetime) or \
@@ -38,9 +101,7 @@ def parse_url(log, args):
 
 def parse_log(line, log, args):
     """Checking that a line is a log line and do parse parameters if so"""
-    re_log = r'^\[(\d{1,2}/\w+/\d{4})[ ](\d{1,2}:\d{1,2}:\d{1,2})][ ]\"(\w+)[ ](.*)[ ](.*)\"[ ](\d+)[ ](\d+)'
-
-    r_value = re.match(re_log, line)
+    r_value = re_log.match(line)
 
     if not r_value:
         return False
@@ -72,20 +133,305 @@ def calc_avgtime(urls_count, urls_resptime):
         urls_resptime[url] //= count
 
 
-def parse(
-    ignore_files=False,
-    ignore_urls=[],
-    start_at=None,
-    stop_at=None,
-    request_type=None,
-    ignore_www=False,
-    slow_queries=False
-):
-    """Main function for log file processing"""
-    log_file = 'log.log'  # Log filename
-    if not path.isfile(log_file):
-        print("File {} not found".format(log_file))
-        exit(1)
+def time_bucket(value, seconds):
+    """Unix time of the beginning of the 'seconds' long bucket of a log timestamp"""
+    stamp = timegm(parse_datetime(value))
+    return stamp - stamp % seconds
+
+
+@lru_cache(maxsize=4096)
+def minute_bucket(value):
+    return time_bucket(value, 60)
+
+
+@lru_cache(maxsize=4096)
+def hour_bucket(value):
+    return time_bucket(value, 3600)
+
+
+# Group keys of a counted log line by field names of group_by
+group_fields = {
+    'url': lambda log, url: url,
+    'host': lambda log, url: url.partition('/')[0],
+    'method': lambda log, url: log.request_type,
+    'code': lambda log, url: log.response_code,
+    'minute': lambda log, url: minute_bucket(log.request_date + " " + log.request_time),
+    'hour': lambda log, url: hour_bucket(log.request_date + " " + log.request_time)
+}
+
+
+def group_key(fields):
+    """Key function of a group by one field or by a tuple of fields"""
+    if isinstance(fields, str):
+        return group_fields[fields]
+    funcs = [group_fields[field] for field in fields]
+    return lambda log, url: tuple(func(log, url) for func in funcs)
+
+
+def expand_paths(log_files):
+    """Log file names by paths and glob patterns, the files matched by a pattern are sorted by name"""
+    if isinstance(log_files, str):
+        log_files = [log_files]
+    filenames = []
+    for pattern in log_files:
+        found = sorted(filename for filename in glob(pattern) if path.isfile(filename))
+        if not found:
+            print("File {} not found".format(pattern))
+            exit(1)
+        filenames.extend(found)
+    return filenames
+
+
+def is_compressed(filename):
+    return path.splitext(filename)[1] in openers
+
+
+def open_log(filename):
+    """Opening a log file in text mode, compressed files are decompressed on the fly"""
+    opener = openers.get(path.splitext(filename)[1])
+    return opener(filename, 'rt') if opener else open(filename)
+
+
+def read_log(filename):
+    """
+    Reading lines of a log file.
+    A compressed file is read in a background thread, so decompression overlaps with parsing"""
+    if not is_compressed(filename):
+        with open(filename) as f:
+            yield from f
+        return
+
+    blocks = queue.Queue(maxsize=read_queue)
+    stop = threading.Event()
+
+    def reader():
+        try:
+            with open_log(filename) as f:
+                while not stop.is_set():
+                    block = f.readlines(read_block)
+                    blocks.put(block)
+                    if not block:
+                        break
+        except Exception as e:
+            blocks.put(e)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while True:
+            block = blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                break
+            yield from block
+    finally:
+        # The reader may wait for a free place in the queue if lines are not read up to the end
+        stop.set()
+        while thread.is_alive():
+            try:
+                blocks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class QuantileSketch:
+    """
+    Mergeable sketch of response times with logarithmic buckets (HDR-style).
+    A value v >= 1 goes to the bucket ceil(log(v) / log(gamma)), so any quantile is estimated
+    with a relative error under 'accuracy'. The number of buckets depends on the range of values only:
+    about 1000 buckets for times up to 10^9 whatever the number of requests."""
+    accuracy = 0.01
+    gamma = (1 + accuracy) / (1 - accuracy)
+
+    def __init__(self):
+        self.buckets = Counter()  # Bucket: count storage, values below 1 go to the bucket None
+        self.count = 0
+
+    def add(self, value):
+        self.buckets[value_bucket(value)] += 1
+        self.count += 1
+
+    def merge(self, other):
+        """Adding the values of another sketch, e.g. made by another worker"""
+        self.buckets.update(other.buckets)
+        self.count += other.count
+
+    def quantile(self, q):
+        """Estimate of the value of rank q * (count - 1) among the sorted values, q is from 0 to 1"""
+        if not self.count:
+            return None
+        rank = int(q * (self.count - 1))
+        seen = self.buckets[None]
+        if rank < seen:
+            return 0
+        for bucket in sorted(bucket for bucket in self.buckets if bucket is not None):
+            seen += self.buckets[bucket]
+            if rank < seen:
+                # Middle of the bucket (gamma^(bucket - 1), gamma^bucket] by relative error
+                return round(2 * self.gamma ** bucket / (self.gamma + 1))
+
+    def percentiles(self, percents):
+        return [self.quantile(percent / 100) for percent in percents]
+
+
+@lru_cache(maxsize=65536)
+def value_bucket(value):
+    """Bucket of a response time in QuantileSketch, cached as times repeat a lot"""
+    if value < 1:
+        return None
+    return ceil(math_log(value) / math_log(QuantileSketch.gamma))
+
+
+class SpaceSaving:
+    """
+    Approximate counting of the most frequent URLs in a fixed memory (Space-Saving algorithm).
+    At most 'capacity' URLs are monitored, a new URL replaces the one with the smallest count
+    and inherits that count as its error. The count of a monitored URL is an upper bound of the true
+    count, which is at least count - error; every URL met more than total / capacity times is monitored."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.total = 0  # Number of counted requests
+        # URL: [count, error, sum of response times, requests since the URL is monitored]
+        self.counts = {}
+        self.buckets = {}  # Count: URLs with this count, the smallest one is replaced first
+        self.min_count = 0
+
+    def _unlink(self, url, count):
+        bucket = self.buckets[count]
+        del bucket[url]
+        if not bucket:
+            del self.buckets[count]
+
+    def add(self, url, resptime=0):
+        self.total += 1
+        entry = self.counts.get(url)
+        if entry is None:
+            if len(self.counts) < self.capacity:
+                entry = [0, 0, 0, 0]
+            else:
+                evicted = next(iter(self.buckets[self.min_count]))
+                self._unlink(evicted, self.min_count)
+                del self.counts[evicted]
+                entry = [self.min_count, self.min_count, 0, 0]
+            self.counts[url] = entry
+        else:
+            self._unlink(url, entry[0])
+        count = entry[0] + 1
+        entry[0] = count
+        entry[2] += resptime
+        entry[3] += 1
+        self.buckets.setdefault(count, {})[url] = None
+        if count == 1 or count - 1 == self.min_count and count - 1 not in self.buckets:
+            self.min_count = count
+
+    def merge(self, other):
+        """
+        Adding the summary of another part of the log.
+        A URL not monitored by a full summary may have been met there up to its min_count times,
+        which is added to the count and to the error, then the largest counts are kept"""
+        self_min = self.min_count if len(self.counts) >= self.capacity else 0
+        other_min = other.min_count if len(other.counts) >= other.capacity else 0
+        merged = {}
+        for url in chain(self.counts, other.counts):
+            if url not in merged:
+                own = self.counts.get(url, (self_min, self_min, 0, 0))
+                another = other.counts.get(url, (other_min, other_min, 0, 0))
+                merged[url] = [a + b for a, b in zip(own, another)]
+        self.total += other.total
+        self.counts, self.buckets = {}, {}
+        for url in nlargest(self.capacity, merged, key=lambda url: merged[url][0]):
+            self.counts[url] = merged[url]
+            self.buckets.setdefault(merged[url][0], {})[url] = None
+        self.min_count = min(self.buckets) if self.buckets else 0
+
+    def top(self, top):
+        """The most frequent URLs as (url, count, error), the true count is from count - error to count"""
+        return [(url, self.counts[url][0], self.counts[url][1])
+                for url in nlargest(top, self.counts, key=lambda url: self.counts[url][0])]
+
+    def slowest(self, top):
+        """
+        URLs with the largest average response times as (url, average time).
+        The average is taken over the requests since the URL is monitored"""
+        averages = {url: entry[2] // entry[3] for url, entry in self.counts.items()}
+        return nlargest(top, averages.items(), key=lambda item: item[1])
+
+
+class UrlStats:
+    """URL statistics of a log or of a part of it"""
+
+    def __init__(self, heavy_hitters=None):
+        self.urls_count = Counter()  # URL: count storage
+        self.urls_resptime = Counter()  # URL: sum response time storage
+        self.urls_sketch = {}  # URL: response time QuantileSketch storage
+        self.groups = {}  # group_by item: {key: [count, sum response time, max response time]} storage
+        # Approximate counters in a fixed memory instead of the storages above
+        self.hitters = SpaceSaving(heavy_hitters) if heavy_hitters else None
+
+    def update(self, other):
+        """
+        Merging the statistics of a following part of the log.
+        URLs keep the order of their first appearance, so most_common() ties are broken the same way
+        as for the whole log counted at once"""
+        if self.hitters is not None:
+            self.hitters.merge(other.hitters)
+            return
+        self.urls_count.update(other.urls_count)
+        self.urls_resptime.update(other.urls_resptime)
+        for url, sketch in other.urls_sketch.items():
+            if url in self.urls_sketch:
+                self.urls_sketch[url].merge(sketch)
+            else:
+                self.urls_sketch[url] = sketch
+        for fields, other_group in other.groups.items():
+            group = self.groups.setdefault(fields, {})
+            for key, (count, resptime, max_resptime) in other_group.items():
+                if key in group:
+                    item = group[key]
+                    item[0] += count
+                    item[1] += resptime
+                    if max_resptime > item[2]:
+                        item[2] = max_resptime
+                else:
+                    group[key] = [count, resptime, max_resptime]
+
+
+def line_blocks(lines):
+    """Joining lines into blocks of columnar_block lines"""
+    lines = iter(lines)
+    while True:
+        block = ''.join(islice(lines, columnar_block))
+        if not block:
+            return
+        yield block
+
+
+def read_log_blocks(filename):
+    """Reading a log file by blocks of whole lines for the columnar mode"""
+    if is_compressed(filename):
+        yield from line_blocks(read_log(filename))
+        return
+    with open(filename) as f:
+        tail = ''
+        while True:
+            data = f.read(columnar_read)
+            if not data:
+                break
+            data = tail + data
+            cut = data.rfind('\n') + 1  # An incomplete last line is joined with the next block
+            tail = data[cut:]
+            if cut:
+                yield data[:cut]
+        if tail:
+            yield tail
+
+
+def count_urls(lines, args):
+    """Counting URLs, summing their response times and collecting their percentiles over the lines of a log"""
+    if args.columnar:
+        return count_urls_columnar(line_blocks(lines), args)
 
     # Human-readable format for log items
     log = SimpleNamespace(
@@ -98,52 +444,855 @@ def parse(
         response_time=None
     )
 
-    # Save arguments for convenient access
-    args = SimpleNamespace(
+    stats = UrlStats(args.heavy_hitters)
+    urls_count, urls_resptime, urls_sketch = stats.urls_count, stats.urls_resptime, stats.urls_sketch
+    hitters = stats.hitters
+    groups = [(group_key(fields), stats.groups.setdefault(fields, {})) for fields in args.group_by]
+
+    for line in lines:
+        log_url = parse_log(line.rstrip(), log, args)  # Check that the line is a log line and parse it if so
+
+        if not log_url:
+            continue
+        elif hitters is not None:
+            hitters.add(log_url, log.response_time)
+        else:
+            urls_count[log_url] += 1
+            if args.slow_queries:
+                urls_resptime[log_url] += log.response_time
+            if args.percentiles:
+                if log_url not in urls_sketch:
+                    urls_sketch[log_url] = QuantileSketch()
+                urls_sketch[log_url].add(log.response_time)
+        for key_func, group in groups:
+            key = key_func(log, log_url)
+            item = group.get(key)
+            if item is None:
+                group[key] = [1, log.response_time, log.response_time]
+            else:
+                item[0] += 1
+                item[1] += log.response_time
+                if log.response_time > item[2]:
+                    item[2] = log.response_time
+
+    return stats
+
+
+class ColumnsEncoder:
+    """
+    Dictionary encoding of the columns of parsed log lines for the columnar mode.
+    Every distinct request URL, request type and timestamp is checked against the parameters once"""
+    invalid_url = -2  # Id of a request URL without a host
+
+    def __init__(self, args):
+        self.args = args
+        # Only the needed fields are captured, a block is matched by the same log line pattern
+        needed = {'request_url'}
+        if args.start_at or args.stop_at:
+            needed.update(('request_date', 'request_time'))
+        if args.request_type:
+            needed.add('request_type')
+        if args.slow_queries or args.percentiles:
+            needed.add('response_time')
+        self.fields = [name for name, pattern in log_fields if name in needed]
+        self.regexp = log_regexp(needed)
+        self.keys = []  # Counted URLs by their ids
+        self.key_ids = {}  # Counted URL: id
+        self.url_ids = {}  # Request URL: id of the counted URL, -1 for an ignored one, invalid_url
+        self.type_ok = {}  # Request type: True if it is counted
+        self.stamps = {}  # Request date and time: seconds since the epoch
+        self.start = timegm(args.start_datetime) if args.start_at else None
+        self.stop = timegm(args.stop_datetime) if args.stop_at else None
+
+    def url_id(self, request_url):
+        """Id of the counted URL of a request, -1 for an ignored one, invalid_url if it has no host"""
+        try:
+            key = url_key(request_url, self.args)
+        except TypeError:
+            """Host of a URL without it is None"""
+            return self.invalid_url
+        if not key or self.args.ignore_urls and key in self.args.ignore_urls:
+            return -1
+        if key not in self.key_ids:
+            self.key_ids[key] = len(self.keys)
+            self.keys.append(key)
+        return self.key_ids[key]
+
+    def parse_block(self, block):
+        """Columns of the needed fields of the log lines in a block of lines, None if there are no log lines"""
+        rows = self.regexp.findall(block)
+        if not rows:
+            return None
+        if len(self.fields) == 1:
+            return {self.fields[0]: rows}
+        return dict(zip(self.fields, zip(*rows)))
+
+    def url_ids_column(self, urls, type_mask=None):
+        """
+        Ids of the counted URLs, -1 for the lines skipped by type_mask.
+        As in parse_log, URLs of the skipped lines are not parsed, a counted URL without a host is an error"""
+        url_ids = self.url_ids
+        if type_mask is None:
+            for url in set(urls).difference(url_ids):
+                url_ids[url] = self.url_id(url)
+            ids = list(map(url_ids.__getitem__, urls))
+        else:
+            for url in set(compress(urls, type_mask)).difference(url_ids):
+                url_ids[url] = self.url_id(url)
+            ids = [url_ids[url] if type_ok else -1 for url, type_ok in zip(urls, type_mask)]
+        if self.invalid_url in ids:
+            raise ValueError('Request URL {} has no host'.format(urls[ids.index(self.invalid_url)]))
+        return ids
+
+    def is_type_ok(self, request_type):
+        return request_type.lower() == self.args.request_type.lower()
+
+    def type_mask(self, columns):
+        """True for the lines with the requested type, None if all types are counted"""
+        if not self.args.request_type:
+            return None
+        types = columns['request_type']
+        type_ok = self.type_ok
+        for request_type in set(types).difference(type_ok):
+            type_ok[request_type] = self.is_type_ok(request_type)
+        return list(map(type_ok.__getitem__, types))
+
+    def time_mask(self, columns, ids):
+        """
+        True for the lines in the time window, None if there is no window.
+        As in parse_url, only the dates of the lines with a counted URL (ids) are parsed"""
+        if self.start is None and self.stop is None:
+            return None
+        stamps = self.stamps
+        values = [value if key_id >= 0 else None
+                  for key_id, value in zip(ids, map('{} {}'.format, columns['request_date'], columns['request_time']))]
+        for value in set(values).difference(stamps):
+            if value is not None:
+                stamps[value] = timegm(parse_datetime(value))
+        start = self.start if self.start is not None else float('-inf')
+        stop = self.stop if self.stop is not None else float('inf')
+        return [value is not None and start <= stamps[value] <= stop for value in values]
+
+
+def count_block_columnar(block, encoder, stats):
+    """
+    Parsing a block of log lines into columns and counting them into stats.
+    URLs are replaced by the ids of the counted URLs, parameters are applied as masks over the columns
+    in the order of parse_log, so the values of the skipped lines are not parsed"""
+    columns = encoder.parse_block(block)
+    if columns is None:
+        return
+    ids = encoder.url_ids_column(columns['request_url'], encoder.type_mask(columns))
+    time_mask = encoder.time_mask(columns, ids)
+    masks = [time_mask] if time_mask is not None else []
+    resptimes = list(map(int, columns['response_time'])) if 'response_time' in columns else None
+    count_columns(ids, masks, resptimes, encoder.keys, encoder.args, stats)
+
+
+def count_columns(ids, masks, resptimes, keys, args, stats):
+    """
+    Counting the lines selected by masks into stats.
+    ids - column of the counted URL ids (-1 for an ignored URL), keys - counted URLs by ids,
+    resptimes - column of response times if they are needed"""
+    need_resptime = args.slow_queries or args.percentiles
+
+    if np is not None:
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = ids >= 0
+        for other in masks:
+            mask &= np.asarray(other, dtype=bool)
+        selected = ids[mask]
+        if not len(selected):
+            return
+        counts = np.bincount(selected)
+        # Counted URLs in the order of their first appearance, as in the line by line counting
+        uniq, first = np.unique(selected, return_index=True)
+        order = uniq[np.argsort(first, kind='stable')]
+        stats.urls_count.update({keys[key_id]: int(counts[key_id]) for key_id in order})
+        if need_resptime:
+            resptimes = np.asarray(resptimes, dtype=np.int64)[mask]
+            if args.slow_queries:
+                sums = np.bincount(selected, weights=resptimes)
+                stats.urls_resptime.update({keys[key_id]: int(sums[key_id]) for key_id in order})
+            if args.percentiles:
+                selected, resptimes = selected.tolist(), resptimes.tolist()
+    else:
+        mask = [key_id >= 0 for key_id in ids]
+        for other in masks:
+            mask = list(map(operator.and_, mask, other))
+        selected = list(compress(ids, mask))
+        stats.urls_count.update(Counter(map(keys.__getitem__, selected)))
+        if need_resptime:
+            resptimes = list(compress(resptimes, mask))
+            if args.slow_queries:
+                urls_resptime = Counter()
+                for key_id, resptime in zip(selected, resptimes):
+                    urls_resptime[keys[key_id]] += resptime
+                stats.urls_resptime.update(urls_resptime)
+
+    if args.percentiles:
+        urls_sketch = stats.urls_sketch
+        for key_id, resptime in zip(selected, resptimes):
+            url = keys[key_id]
+            if url not in urls_sketch:
+                urls_sketch[url] = QuantileSketch()
+            urls_sketch[url].add(resptime)
+
+
+def count_urls_columnar(blocks, args):
+    """Counting URLs over blocks of whole log lines, see count_block_columnar"""
+    stats = UrlStats()
+    encoder = ColumnsEncoder(args)
+    for block in blocks:
+        count_block_columnar(block, encoder, stats)
+    return stats
+
+
+class LogCache:
+    """
+    Pre-parsed log lines in a binary columnar file next to the log file (<log_file>.cols).
+    The file starts with the length of a JSON header: the state of the log file, dictionaries of request URLs
+    and types, offsets and typecodes of the columns. The columns of the log lines follow as arrays and are
+    memory-mapped when the cache is opened. The cache is rebuilt if the size, mtime or inode of the log file
+    has changed. OSError is raised if the cache can't be written or read."""
+    suffix = '.cols'
+    version = 3
+    invalid_stamp = -2 ** 63  # Stamp of a line with a date which can't be parsed
+    # Column: array typecode, a column with a value which doesn't fit is widened to 'q'
+    columns = (('url', 'i'), ('type', 'h'), ('stamp', 'q'), ('code', 'h'), ('resptime', 'i'))
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.cache_file = log_file + self.suffix
+        self._file = None
+        self._mm = None
+        if not self._load():
+            self._build()
+            if not self._load():
+                raise OSError('Cache file {} is not readable'.format(self.cache_file))
+
+    @staticmethod
+    def _align(offset):
+        """Columns are aligned to 8 bytes"""
+        return (offset + 7) // 8 * 8
+
+    def _state(self):
+        stat = os.stat(self.log_file)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def _load(self):
+        """Memory-mapping the columns of the cache made for the current log file, False if there is no such cache"""
+        try:
+            f = open(self.cache_file, 'rb')
+        except OSError:
+            return False
+        try:
+            header = json.loads(f.read(int.from_bytes(f.read(8), 'little')))
+            if header['version'] != self.version or header['state'] != list(self._state()):
+                f.close()
+                return False
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            """Broken cache is rebuilt"""
+            f.close()
+            return False
+        self._file = f
+        self.rows = header['rows']
+        self.urls, self.types = header['urls'], header['types']
+        start = self._align(f.tell())
+        view = memoryview(self._mm)
+        self.data = {}
+        for name, typecode in header['typecodes'].items():
+            offset = start + header['offsets'][name]
+            column = view[offset:offset + self.rows * array(typecode).itemsize]
+            self.data[name] = np.frombuffer(column, dtype=np.dtype(typecode)) if np is not None else \
+                column.cast(typecode)
+        return True
+
+    @staticmethod
+    def _extend(data, name, values):
+        """Appending values to a column, widening it to 64 bits if a value doesn't fit"""
+        column = data[name]
+        size = len(column)
+        values = list(values)
+        try:
+            column.extend(values)
+        except OverflowError:
+            del column[size:]
+            data[name] = column = array('q', column)
+            column.extend(values)
+
+    def _build(self):
+        """Parsing the log file into columns and writing them to the cache file"""
+        state = self._state()
+        regexp = log_regexp([name for name, pattern in log_fields if name != 'request_protocol'])
+        data = {name: array(typecode) for name, typecode in self.columns}
+        url_ids, type_ids, stamps = {}, {}, {}
+        for block in read_log_blocks(self.log_file):
+            rows = regexp.findall(block)
+            if not rows:
+                continue
+            dates, times, types, urls, codes, resptimes = zip(*rows)
+            for values, ids, column in ((urls, url_ids, 'url'), (types, type_ids, 'type')):
+                for value in set(values).difference(ids):
+                    ids[value] = len(ids)
+                self._extend(data, column, map(ids.__getitem__, values))
+            values = list(map('{} {}'.format, dates, times))
+            for value in set(values).difference(stamps):
+                try:
+                    stamps[value] = timegm(parse_datetime(value))
+                except ValueError:
+                    stamps[value] = self.invalid_stamp
+            data['stamp'].extend(map(stamps.__getitem__, values))
+            self._extend(data, 'code', map(int, codes))
+            self._extend(data, 'resptime', map(int, resptimes))
+
+        offsets, offset = {}, 0
+        for name, typecode in self.columns:
+            offsets[name] = offset
+            offset = self._align(offset + len(data[name]) * data[name].itemsize)
+        header = {
+            'version': self.version,
+            'state': state,
+            'rows': len(data['url']),
+            'urls': sorted(url_ids, key=url_ids.__getitem__),
+            'types': sorted(type_ids, key=type_ids.__getitem__),
+            'offsets': offsets,
+            'typecodes': {name: data[name].typecode for name, typecode in self.columns}
+        }
+        header_bytes = json.dumps(header).encode()
+        start = self._align(8 + len(header_bytes))
+
+        tmpfile = '{}.{}'.format(self.cache_file, os.getpid())
+        try:
+            with open(tmpfile, 'wb') as f:
+                f.write(len(header_bytes).to_bytes(8, 'little'))
+                f.write(header_bytes)
+                for name, typecode in self.columns:
+                    f.write(bytes(start + offsets[name] - f.tell()))
+                    data[name].tofile(f)
+            os.replace(tmpfile, self.cache_file)
+        except OSError:
+            if path.isfile(tmpfile):
+                os.remove(tmpfile)
+            raise
+
+    def close(self):
+        self.data = {}
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                """Columns are still referenced (e.g. by a traceback), the map is closed when they are freed"""
+                pass
+            self._file.close()
+            self._mm = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def count_urls_cached(log_file, args):
+    """
+    Counting URLs over the columns of the log file cache, the cache is built if it is missing or outdated.
+    The cache is an optimization only: if it can't be written, the log file is parsed in the columnar mode"""
+    try:
+        cache = LogCache(log_file)
+    except OSError:
+        return count_urls_columnar(read_log_blocks(log_file), args)
+    with cache:
+        return count_cache_columns(cache, args)
+
+
+def count_cache_columns(cache, args):
+    """Counting URLs over the memory-mapped columns, every dictionary value is checked against the parameters once"""
+    stats = UrlStats()
+    if not cache.rows:
+        return stats
+    encoder = ColumnsEncoder(args)
+    url_ids = [encoder.url_id(url) for url in cache.urls]
+    type_ok = [encoder.is_type_ok(request_type) for request_type in cache.types] if args.request_type else None
+    window = encoder.start is not None or encoder.stop is not None
+    start = encoder.start if encoder.start is not None else cache.invalid_stamp
+    stop = encoder.stop if encoder.stop is not None else -cache.invalid_stamp - 1
+    stamp = cache.data['stamp']
+
+    # As in parse_log, an invalid URL or date is an error only in a line which is not skipped before it is parsed
+    masks = []
+    if np is not None:
+        ids = np.array(url_ids, dtype=np.int64)[cache.data['url']]
+        if type_ok is not None:
+            ids[~np.array(type_ok, dtype=bool)[cache.data['type']]] = -1
+        invalid_url = (ids == encoder.invalid_url).any()
+        invalid_stamp = window and (stamp[ids >= 0] == cache.invalid_stamp).any()
+        if window:
+            masks.append((stamp >= start) & (stamp <= stop))
+    else:
+        ids = list(map(url_ids.__getitem__, cache.data['url']))
+        if type_ok is not None:
+            ids = [key_id if type_ok[type_id] else -1 for key_id, type_id in zip(ids, cache.data['type'])]
+        invalid_url = encoder.invalid_url in ids
+        invalid_stamp = window and cache.invalid_stamp in compress(stamp, [key_id >= 0 for key_id in ids])
+        if window:
+            masks.append([start <= value <= stop for value in stamp])
+    if invalid_url:
+        raise ValueError('Log file {} has a request URL without a host'.format(cache.log_file))
+    if invalid_stamp:
+        raise ValueError('Log file {} has a date which does not match {}'.format(cache.log_file, date_format))
+    resptimes = cache.data['resptime'] if args.slow_queries or args.percentiles else None
+    count_columns(ids, masks, resptimes, encoder.keys, args, stats)
+    return stats
+
+
+class TimeIndex:
+    """
+    Sparse time index of a log file next to it (<log_file>.tidx): byte ranges of blocks of about 'step' bytes
+    with the earliest and the latest time of their log lines. Lines are almost time-ordered, so a narrow window
+    selects a few blocks; a block is selected by its own time range, so out-of-order lines are never missed.
+    The index is extended when the log file is appended to and rebuilt if it is changed otherwise.
+    The index file is a line of a JSON header followed by the blocks as a raw array of 64-bit integers."""
+    suffix = '.tidx'
+    step = 2 ** 20  # Approximate size of an indexed block
+    tail_size = 4096  # Size of the indexed data tail used to detect appends
+    no_stamp = -2 ** 63  # Earliest and latest time of a block without log lines in the index file
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.index_file = log_file + self.suffix
+        # Blocks as (start, end, earliest time, latest time, has a date which can't be parsed)
+        self.blocks = []
+        with open(log_file, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._state = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            scanned = self._load(f)
+            if scanned < stat.st_size:
+                self._scan(f, scanned)
+                self._save(f)
+
+    def _tail_crc(self, f, size):
+        f.seek(max(0, size - self.tail_size))
+        return zlib.crc32(f.read(min(size, self.tail_size)))
+
+    def _load(self, f):
+        """Loading the index and returning the size of the file covered by it"""
+        try:
+            with open(self.index_file, 'rb') as index:
+                saved = json.loads(index.readline())
+                values = array('q')
+                values.fromfile(index, saved['count'] * 5)
+            blocks = [(block_start, block_end, None if earliest == self.no_stamp else earliest,
+                       None if latest == self.no_stamp else latest, bool(invalid))
+                      for block_start, block_end, earliest, latest, invalid in zip(*[iter(values)] * 5)]
+            if saved['step'] != self.step or saved['state'][2] != self._state[2]:
+                return 0
+            size = saved['state'][0]
+            if size > self._state[0] or saved['tail_crc'] != self._tail_crc(f, size):
+                return 0
+            if size == self._state[0]:
+                if saved['state'] != list(self._state):
+                    return 0  # Rewritten in place with the same size
+                self.blocks = blocks
+                return size
+            self.blocks = blocks
+            # Appended: the last block may end with an incomplete line and is indexed again
+            last = self.blocks.pop() if self.blocks else (0, 0)
+            return last[0]
+        except Exception:
+            """Missing or broken index is rebuilt"""
+            self.blocks = []
+            return 0
+
+    def _save(self, f):
+        saved = {
+            'step': self.step,
+            'state': self._state,
+            'tail_crc': self._tail_crc(f, self._state[0]),
+            'count': len(self.blocks)
+        }
+        values = array('q')
+        for block_start, block_end, earliest, latest, invalid in self.blocks:
+            values.extend((block_start, block_end, self.no_stamp if earliest is None else earliest,
+                           self.no_stamp if latest is None else latest, invalid))
+        tmpfile = '{}.{}'.format(self.index_file, os.getpid())
+        try:
+            with open(tmpfile, 'wb') as index:
+                index.write(json.dumps(saved).encode() + b'\n')
+                values.tofile(index)
+            os.replace(tmpfile, self.index_file)
+        except OSError:
+            """Index is an optimization only, the windows are still answered from memory"""
+            if path.isfile(tmpfile):
+                os.remove(tmpfile)
+
+    def _scan(self, f, start):
+        """Indexing the blocks from the byte 'start' up to the end of the file"""
+        regexp = log_regexp(('request_date', 'request_time'))
+        stamps = {}
+        f.seek(start)
+        while True:
+            data = f.read(self.step)
+            if not data:
+                break
+            data += f.readline()  # Blocks end at line boundaries
+            earliest = latest = None
+            invalid = False
+            # Same decoding and newline handling as for the whole file opened in text mode
+            rows = regexp.findall(io.TextIOWrapper(io.BytesIO(data)).read())
+            for value in {'{} {}'.format(date, time) for date, time in rows}:
+                if value not in stamps:
+                    try:
+                        stamps[value] = timegm(parse_datetime(value))
+                    except ValueError:
+                        stamps[value] = None
+                stamp = stamps[value]
+                if stamp is None:
+                    invalid = True
+                    continue
+                earliest = stamp if earliest is None else min(earliest, stamp)
+                latest = stamp if latest is None else max(latest, stamp)
+            self.blocks.append((start, start + len(data), earliest, latest, invalid))
+            start += len(data)
+
+    def ranges(self, start=None, stop=None):
+        """Byte ranges of the blocks which may have lines from 'start' to 'stop' seconds, adjacent ones are joined"""
+        selected = []
+        for block_start, block_end, earliest, latest, invalid in self.blocks:
+            # A block with a broken date is read to fail the same way as without the index
+            if not invalid and (earliest is None or start is not None and latest < start or
+                                stop is not None and earliest > stop):
+                continue
+            if selected and selected[-1][1] == block_start:
+                selected[-1] = (selected[-1][0], block_end)
+            else:
+                selected.append((block_start, block_end))
+        return selected
+
+
+def count_urls_indexed(log_file, args):
+    """Counting URLs only in the blocks of a log file which may have lines in the time window"""
+    index = TimeIndex(log_file)
+    start = timegm(args.start_datetime) if args.start_at else None
+    stop = timegm(args.stop_datetime) if args.stop_at else None
+    stats = UrlStats(args.heavy_hitters)
+    for bounds in index.ranges(start, stop):
+        stats.update(count_urls_chunk((log_file,) + bounds, args))
+    return stats
+
+
+def split_file(filename, parts):
+    """Splitting a file into byte ranges by line boundaries, at least 'parts' ranges if the file is big enough"""
+    file_size = path.getsize(filename)
+    size = min(chunk_size, file_size // parts + 1)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        while bounds[-1] + size < file_size:
+            f.seek(bounds[-1] + size - 1)
+            f.readline()
+            if f.tell() >= file_size:
+                break
+            bounds.append(f.tell())
+    bounds.append(file_size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def count_urls_chunk(task, args):
+    """Counting URLs in the byte range of a log file or in a whole compressed file, runs in a worker process"""
+    log_file, start, end = task
+    if start is None:
+        return count_urls(read_log(log_file), args)
+    with open(log_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # Same decoding and newline handling as for the whole file opened in text mode
+    return count_urls(io.TextIOWrapper(io.BytesIO(data)), args)
+
+
+def count_urls_parallel(filenames, args, jobs):
+    """
+    Counting URLs in chunks of log files by a pool of 'jobs' processes.
+    Compressed files can't be split and are parsed whole by a worker.
+    Partial statistics are merged in the file order, so the result is the same as of a serial run"""
+    tasks = []
+    for filename in filenames:
+        if is_compressed(filename):
+            tasks.append((filename, None, None))
+        else:
+            tasks.extend((filename, start, end) for start, end in split_file(filename, jobs))
+
+    stats = UrlStats(args.heavy_hitters)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for chunk_stats in pool.map(partial(count_urls_chunk, args=args), tasks):
+            stats.update(chunk_stats)
+    return stats
+
+
+def make_args(
+    ignore_files=False,
+    ignore_urls=[],
+    start_at=None,
+    stop_at=None,
+    request_type=None,
+    ignore_www=False,
+    slow_queries=False,
+    percentiles=None,
+    heavy_hitters=None,
+    columnar=False,
+    cache=False,
+    time_index=False,
+    group_by=()
+):
+    """Save arguments for convenient access"""
+    if percentiles and heavy_hitters:
+        raise ValueError('percentiles are not supported with heavy_hitters')
+    if (columnar or cache) and heavy_hitters:
+        raise ValueError('columnar mode and cache are not supported with heavy_hitters')
+    if group_by and (columnar or cache or heavy_hitters):
+        raise ValueError('group_by is not supported with columnar mode, cache and heavy_hitters')
+    for fields in group_by:
+        for field in [fields] if isinstance(fields, str) else fields:
+            if field not in group_fields:
+                raise ValueError('unknown group_by field: {}'.format(field))
+    return SimpleNamespace(
         ignore_files=ignore_files,
         ignore_urls=ignore_urls,
         start_at=start_at,
         stop_at=stop_at,
         request_type=request_type,
         ignore_www=ignore_www,
-        slow_queries=slow_queries
+        slow_queries=slow_queries,
+        percentiles=percentiles,
+        heavy_hitters=heavy_hitters,
+        columnar=columnar,
+        cache=cache,
+        time_index=time_index,
+        group_by=list(group_by),
+        # Window bounds are parsed once per call
+        start_datetime=strptime(start_at, date_format) if start_at else False,
+        stop_datetime=strptime(stop_at, date_format) if stop_at else False
     )
 
-    out_lst = []  # Output list
-    urls_count = Counter()  # URL: count storage
+
+def group_results(stats, args):
+    """Count, sum, mean and max of response times by keys of every group_by item"""
+    return {
+        fields: {
+            key: {'count': count, 'sum': resptime, 'mean': resptime / count, 'max': max_resptime}
+            for key, (count, resptime, max_resptime) in stats.groups.get(fields, {}).items()
+        }
+        for fields in args.group_by
+    }
+
+
+def top_urls(stats, args):
+    """
+    TOP-5 counts of urls or, for slow_queries, TOP-5 average response times.
+    With percentiles, response time percentiles of the same TOP-5 urls are returned instead.
+    With heavy_hitters, counts are returned as [count, error] pairs, the true count is at least count - error"""
+    top = 5  # TOP-# records from urls
+
+    if stats.hitters is not None:
+        if args.slow_queries:
+            return [avgtime for url, avgtime in stats.hitters.slowest(top)]
+        return [[count, error] for url, count, error in stats.hitters.top(top)]
+
     if args.slow_queries:
-        urls_resptime = Counter()  # URL: sum response time storage
+        urls_resptime = stats.urls_resptime.copy()
+        calc_avgtime(stats.urls_count, urls_resptime)  # Calculating average response time for records
+        top_lst = urls_resptime.most_common(top)
+    else:
+        top_lst = stats.urls_count.most_common(top)
 
-    f = open(log_file)  # Open log file
+    if args.percentiles:
+        return [stats.urls_sketch[tup[0]].percentiles(args.percentiles) for tup in top_lst]
+    return [tup[1] for tup in top_lst]
 
-    while True:
-        line = f.readline()  # Read a line from the log file
 
-        if not line:  # Check that the end of the file is reached
-            break
+class LogFollower:
+    """
+    Incremental processing of a growing log file.
+    Every update() counts only the lines appended since the previous one. The read offset, the inode
+    of the file and the counters are saved to a checkpoint file, so a restarted process resumes
+    where it stopped. A rotated file is read up to the end before switching to the new one."""
 
-        log_url = parse_log(line.rstrip(), log, args)  # Check that the line is a log line and parse it if so
+    def __init__(self, log_file='log.log', checkpoint_file=None, **params):
+        self.log_file = path.abspath(log_file)
+        self.checkpoint_file = checkpoint_file
+        self._params = params
+        self._args = make_args(**params)
+        self._file = None
+        self.inode = None  # Inode of the file read last
+        self.offset = 0  # End of the last counted complete line
+        self.stats = UrlStats(self._args.heavy_hitters)
+        if checkpoint_file:
+            self._load()
 
-        if not log_url:
-            continue
-        else:
-            urls_count[log_url] += 1
-            if args.slow_queries:
-                urls_resptime[log_url] += log.response_time
+    def _load(self):
+        """Restoring the state from the checkpoint made for the same file and parameters"""
+        try:
+            with open(self.checkpoint_file, 'rb') as f:
+                state = pickle.load(f)
+            if state['log_file'] != self.log_file or state['params'] != self._params:
+                return
+            self.inode, self.offset = state['inode'], state['offset']
+            self.stats = state['stats']
+        except Exception:
+            """Missing or broken checkpoint means processing from the beginning"""
+            pass
 
-    # end of for
+    def _save(self):
+        state = {
+            'log_file': self.log_file,
+            'params': self._params,
+            'inode': self.inode,
+            'offset': self.offset,
+            'stats': self.stats
+        }
+        tmpfile = '{}.{}'.format(self.checkpoint_file, os.getpid())
+        with open(tmpfile, 'wb') as f:
+            pickle.dump(state, f)
+        os.replace(tmpfile, self.checkpoint_file)
 
-    f.close()  # Close opened file
-    top = 5  # TOP-# records from urls
+    def _read(self):
+        """Counting the complete lines written to the opened file after the offset"""
+        while True:
+            self._file.seek(self.offset)
+            data = self._file.read(chunk_size)
+            cut = data.rfind(b'\n') + 1  # An incomplete last line is left for the next update
+            if not cut:
+                break
+            self.stats.update(count_urls(io.TextIOWrapper(io.BytesIO(data[:cut])), self._args))
+            self.offset += cut
 
-    if args.slow_queries:
-        calc_avgtime(urls_count, urls_resptime)  # Calculating average response time for records
-        out_lst = [tup[1] for tup in urls_resptime.most_common(top)]
-    else:
-        out_lst = [tup[1] for tup in urls_count.most_common(top)]
+    def _rotated_file(self):
+        """Name of the rotated uncompressed file with the inode read last, if it is near the log file"""
+        for filename in glob(glob_escape(self.log_file) + '?*'):
+            if not is_compressed(filename) and os.stat(filename).st_ino == self.inode:
+                return filename
+
+    def _open(self):
+        """Opening the log file and checking that it is the file read last"""
+        f = open(self.log_file, 'rb')
+        stat = os.fstat(f.fileno())
+        if self.inode is not None and stat.st_ino != self.inode:
+            # Rotated: the rest of the previous file is counted and the new file is read from the beginning
+            if self._file is None:
+                rotated = self._rotated_file()
+                if rotated:
+                    self._file = open(rotated, 'rb')
+            if self._file is not None:
+                self._read()
+            self.offset = 0
+        elif stat.st_size < self.offset:
+            # Truncated in place
+            self.offset = 0
+        if self._file is not None:
+            self._file.close()
+        self._file, self.inode = f, stat.st_ino
+
+    def update(self):
+        """Counting the new lines of the log file and saving the checkpoint, returns the current TOP-5"""
+        if self._file is None:
+            self._open()
+        self._read()
+        try:
+            stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            stat = None  # Rotated, but the new file is not created yet
+        if stat is not None and (stat.st_ino != self.inode or stat.st_size < self.offset):
+            self._open()
+            self._read()
+        if self.checkpoint_file:
+            self._save()
+        return self.top()
+
+    def top(self):
+        return top_urls(self.stats, self._args)
+
+    def follow(self, interval=10):
+        """Infinite updates with 'interval' seconds between them, yields the TOP-5 after every update"""
+        while True:
+            yield self.update()
+            sleep(interval)
 
-    return out_lst
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def parse(
+    ignore_files=False,
+    ignore_urls=[],
+    start_at=None,
+    stop_at=None,
+    request_type=None,
+    ignore_www=False,
+    slow_queries=False,
+    jobs=1,
+    log_files='log.log',
+    percentiles=None,
+    heavy_hitters=None,
+    columnar=False,
+    cache=False,
+    time_index=False
+):
+    """Main function for log file processing"""
+    args = make_args(
+        ignore_files, ignore_urls, start_at, stop_at, request_type, ignore_www, slow_queries, percentiles,
+        heavy_hitters, columnar, cache, time_index)
+    return top_urls(count_stats(log_files, args, jobs), args)
+
+
+def aggregate(
+    group_by=('host', 'code', 'method', 'minute'),
+    ignore_files=False,
+    ignore_urls=[],
+    start_at=None,
+    stop_at=None,
+    request_type=None,
+    ignore_www=False,
+    jobs=1,
+    log_files='log.log',
+    time_index=False
+):
+    """
+    Several group-bys of the counted log lines in one pass over the log.
+    Every group_by item is a field name or a tuple of them (a composite key), the fields are
+    url, host, method, code, minute and hour (Unix time of the bucket beginning).
+    Returns {group_by item: {key: {'count', 'sum', 'mean', 'max'}}} with response time statistics,
+    keys are in the order of their first appearance in the log"""
+    args = make_args(
+        ignore_files, ignore_urls, start_at, stop_at, request_type, ignore_www, time_index=time_index,
+        group_by=group_by)
+    return group_results(count_stats(log_files, args, jobs), args)
+
+
+def count_stats(log_files, args, jobs=1):
+    """Counting the statistics of log files in the mode chosen by the arguments"""
+    filenames = expand_paths(log_files)  # Log filenames by paths and glob patterns
+
+    if args.cache:
+        stats = UrlStats()
+        for filename in filenames:
+            stats.update(count_urls_cached(filename, args))
+    elif args.time_index and (args.start_at or args.stop_at):
+        stats = UrlStats(args.heavy_hitters)
+        for filename in filenames:
+            if is_compressed(filename):
+                stats.update(count_urls(read_log(filename), args))
+            else:
+                stats.update(count_urls_indexed(filename, args))
+    elif jobs > 1:
+        stats = count_urls_parallel(filenames, args, jobs)
+    elif args.columnar:
+        stats = count_urls_columnar(chain.from_iterable(map(read_log_blocks, filenames)), args)
+    else:
+        stats = count_urls(chain.from_iterable(map(read_log, filenames)), args)
+    return stats
 
 
 if __name__ == '__main__':
-    parse()
+    print(parse(log_files=sys.argv[1:] or 'log.log'))
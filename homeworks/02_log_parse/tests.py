@@ -1,8 +1,15 @@
 # -*- encoding: utf-8 -*-
 
+import errno
 import json
+import os
+import random
+import shutil
 from glob import glob
-from log_parse import parse
+from tempfile import TemporaryDirectory
+from collections import Counter
+from unittest import mock
+from log_parse import LogCache, LogFollower, QuantileSketch, SpaceSaving, TimeIndex, aggregate, parse
 
 error_message = 'Ошибка в файле {}. Expected: "{}", got: "{}"'
 
@@ -21,5 +28,248 @@ def run_tests():
     print("All tests passed!")
 
 
+def run_follow_tests():
+    with open('log.log') as f:
+        lines = f.readlines()
+    parts = [lines[:40], lines[40:41], lines[41:90], lines[90:]]
+    with TemporaryDirectory() as tmp:
+        log_file, checkpoint = os.path.join(tmp, 'log.log'), os.path.join(tmp, 'log.chk')
+        steps = []
+        with open(log_file, 'w') as f:
+            f.writelines(parts[0])
+            f.write(parts[1][0][:10])  # Incomplete line is counted after it is written up to the end
+        follower = LogFollower(log_file, checkpoint, slow_queries=True)
+        steps.append((follower.update(), parse(log_files=log_file, slow_queries=True)))
+        with open(log_file, 'a') as f:
+            f.write(parts[1][0][10:])
+            f.writelines(parts[2][:20])
+        steps.append((follower.update(), parse(log_files=log_file, slow_queries=True)))
+        follower.close()
+
+        # Rotation while stopped: the rest of the rotated file and the new file are counted after restart
+        with open(log_file, 'a') as f:
+            f.writelines(parts[2][20:])
+        os.rename(log_file, log_file + '.1')
+        with open(log_file, 'w') as f:
+            f.writelines(parts[3])
+        follower = LogFollower(log_file, checkpoint, slow_queries=True)
+        steps.append((follower.update(), parse(log_files=[log_file + '.1', log_file], slow_queries=True)))
+        follower.close()
+
+        for step, (got, expected) in enumerate(steps):
+            if got != expected:
+                print("Follow mode, step {}: expected {}, got {}".format(step, expected, got))
+                return
+    print("All follow tests passed!")
+
+
+def run_sketch_tests():
+    random.seed(0)
+    values = [int(random.lognormvariate(5, 2)) for _ in range(10000)]
+    whole, parts = QuantileSketch(), [QuantileSketch() for _ in range(3)]
+    for idx, value in enumerate(values):
+        whole.add(value)
+        parts[idx % 3].add(value)
+    merged = QuantileSketch()
+    for part in parts:
+        merged.merge(part)
+    values.sort()
+    for q in (0, 0.5, 0.9, 0.95, 0.99, 1):
+        exact = values[int(q * (len(values) - 1))]
+        got = whole.quantile(q)
+        if abs(got - exact) > exact * QuantileSketch.accuracy + 0.5 or merged.quantile(q) != got:
+            print("Quantile {}: exact {}, got {}, merged {}".format(q, exact, got, merged.quantile(q)))
+            return
+    print("All sketch tests passed!")
+
+
+def run_hitters_tests():
+    random.seed(0)
+    capacity = 20
+    urls = ['/item/{}/'.format(int(random.paretovariate(1.1))) for _ in range(5000)]
+    exact, whole, parts = Counter(urls), SpaceSaving(capacity), [SpaceSaving(capacity) for _ in range(3)]
+    for idx, url in enumerate(urls):
+        whole.add(url)
+        parts[idx % 3].add(url)
+    merged = SpaceSaving(capacity)
+    for part in parts:
+        merged.merge(part)
+    for name, hitters in (('whole', whole), ('merged', merged)):
+        for url, count, error in hitters.top(capacity):
+            if not count - error <= exact[url] <= count:
+                print("Heavy hitters {}: {} counted {} with error {}, exact {}".format(
+                    name, url, count, error, exact[url]))
+                return
+        for url, count in exact.items():
+            if count > len(urls) / capacity and url not in hitters.counts:
+                print("Heavy hitters {}: {} met {} times is lost".format(name, url, count))
+                return
+    print("All heavy hitters tests passed!")
+
+
+def run_cache_tests():
+    cases = [{}, {'slow_queries': True}, {'ignore_www': True, 'ignore_files': True, 'request_type': 'GET'},
+             {'start_at': '20/Mar/2018 11:15:49', 'stop_at': '25/Mar/2018 11:17:30', 'percentiles': [50, 95]}]
+    with TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, 'log.log')
+        shutil.copy('log.log', log_file)
+        for step in range(3):
+            for params in cases:
+                expected = parse(log_files=log_file, **params)
+                got = parse(log_files=log_file, cache=True, **params)
+                if got != expected:
+                    print("Cache, step {}, params {}: expected {}, got {}".format(step, params, expected, got))
+                    return
+            if not os.path.isfile(log_file + LogCache.suffix):
+                print("Cache file is not created")
+                return
+            # The cache must be rebuilt after the log is changed, the second time with values which need
+            # wider columns
+            with open(log_file, 'a') as f:
+                f.write('[25/Mar/2018 11:17:31] "GET https://sys.mail.ru/static/css/reset.css HTTPS/1.1" {} {}\n'.format(
+                    *((200, 7) if step == 0 else (70000, 2 ** 40))) * 9)
+
+        # A cache which isn't a JSON header with columns (e.g. pickled) is rebuilt
+        header = b'\x80\x04garbage.'
+        with open(log_file + LogCache.suffix, 'wb') as f:
+            f.write(len(header).to_bytes(8, 'little') + header)
+        got = parse(log_files=log_file, cache=True, slow_queries=True)
+        expected = parse(log_files=log_file, slow_queries=True)
+        with open(log_file + LogCache.suffix, 'rb') as f:
+            rebuilt = f.read(8 + len(header))[8:] != header
+        if got != expected or not rebuilt:
+            print("Broken cache: expected {}, got {}, rebuilt {}".format(expected, got, rebuilt))
+            return
+
+        # A cache which can't be written is skipped without leaving temporary files
+        os.remove(log_file + LogCache.suffix)
+        with mock.patch('log_parse.os.replace', side_effect=OSError(errno.ENOSPC, 'No space left on device')):
+            got = parse(log_files=log_file, cache=True, slow_queries=True)
+        expected = parse(log_files=log_file, slow_queries=True)
+        if got != expected or os.listdir(tmp) != ['log.log']:
+            print("Cache write failure: expected {}, got {}, files {}".format(expected, got, os.listdir(tmp)))
+            return
+    print("All cache tests passed!")
+
+
+def run_skipped_tests():
+    # Values of the skipped lines are never parsed: a URL without a host, an invalid date
+    lines = ['[20/Mar/2018 11:00:00] "GET https://mail.ru/a/ HTTP/1.1" 200 5\n',
+             '[20/Mar/2018 11:00:01] "POST /upload HTTP/1.1" 200 7\n',
+             '[18/Xyz/2018 11:00:02] "POST https://mail.ru/b/c.png HTTP/1.1" 200 9\n']
+    cases = [({'request_type': 'GET'}, [1]),
+             ({'request_type': 'GET', 'start_at': '20/Mar/2018 10:00:00'}, [1]),
+             ({'ignore_files': True, 'stop_at': '21/Mar/2018 10:00:00'}, [1])]
+    with TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, 'log.log')
+        with open(log_file, 'w') as f:
+            f.writelines(lines)
+        for params, expected in cases:
+            for mode in ({}, {'columnar': True}, {'cache': True}, {'time_index': True}, {'jobs': 2}):
+                got = parse(log_files=log_file, **dict(params, **mode))
+                if got != expected:
+                    print("Skipped lines, params {}: expected {}, got {}".format(dict(params, **mode), expected, got))
+                    return
+    print("All skipped lines tests passed!")
+
+
+def run_index_tests():
+    # The sample log has out-of-order lines, small blocks put them into different blocks
+    windows = [('20/Mar/2018 11:15:49', '25/Mar/2018 11:17:30'), ('21/Mar/2018 21:32:09', None),
+               (None, '20/Mar/2018 11:15:48'), ('28/Mar/2018 11:19:41', '28/Mar/2018 11:19:41'),
+               ('01/Apr/2018 00:00:00', None)]
+    step = TimeIndex.step
+    TimeIndex.step = 300
+    try:
+        with TemporaryDirectory() as tmp:
+            log_file = os.path.join(tmp, 'log.log')
+            shutil.copy('log.log', log_file)
+            for step_idx in range(3):
+                for start_at, stop_at in windows:
+                    params = {'start_at': start_at, 'stop_at': stop_at, 'slow_queries': step_idx == 1}
+                    expected = parse(log_files=log_file, **params)
+                    got = parse(log_files=log_file, time_index=True, **params)
+                    if got != expected:
+                        print("Time index, step {}, params {}: expected {}, got {}".format(
+                            step_idx, params, expected, got))
+                        return
+                # Appended lines, the last one is incomplete at first
+                with open(log_file, 'a') as f:
+                    f.write('3] "GET https://mail.ru/x/ HTTP/1.1" 200 5\n' if step_idx else '')
+                    f.write('[01/Apr/2018 10:00:00] "GET https://mail.ru/x/ HTTP/1.1" 200 5\n[01/Apr/2018 10:00:0')
+            # Saved blocks, also without log lines or with a broken date, are loaded as they were indexed
+            with open(log_file, 'a') as f:
+                f.write('0] "GET https://mail.ru/x/ HTTP/1.1" 200 5\n' + 'no log line\n' * 30)
+                f.write('[18/Xyz/2018 10:00:00] "GET https://mail.ru/x/ HTTP/1.1" 200 5\n')
+            blocks = TimeIndex(log_file).blocks
+            loaded = TimeIndex(log_file).blocks
+            with open(log_file + TimeIndex.suffix, 'wb') as f:
+                f.write(b'\x80\x04garbage.')
+            if loaded != blocks or TimeIndex(log_file).blocks != blocks or \
+                    not any(block[2] is None for block in blocks) or not blocks[-1][4]:
+                print("Time index, saved blocks: expected {}, got {}".format(blocks, loaded))
+                return
+        # Rewritten in place with the same size and tail: the first lines move to a later date
+        with TemporaryDirectory() as tmp:
+            log_file = os.path.join(tmp, 'log.log')
+            line = '[{:02d}/Mar/2018 11:00:00] "GET https://mail.ru/{}/ HTTP/1.1" 200 5\n'
+            with open(log_file, 'w') as f:
+                f.writelines(line.format(10 if idx < 100 else 20, idx % 5) for idx in range(200))
+            params = {'start_at': '15/Mar/2018 00:00:00', 'stop_at': '16/Mar/2018 00:00:00'}
+            parse(log_files=log_file, time_index=True, **params)
+            stat = os.stat(log_file)
+            with open(log_file, 'w') as f:
+                f.writelines(line.format(15 if idx < 100 else 20, idx % 5) for idx in range(200))
+            os.utime(log_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            expected = parse(log_files=log_file, **params)
+            got = parse(log_files=log_file, time_index=True, **params)
+            if got != expected or not got:
+                print("Time index, same size rewrite: expected {}, got {}".format(expected, got))
+                return
+    finally:
+        TimeIndex.step = step
+    print("All time index tests passed!")
+
+
+def run_aggregate_tests():
+    group_by = ['url', 'host', 'code', 'method', 'minute', ('host', 'code')]
+    got = aggregate(group_by, log_files='log.log')
+    # Counts and mean times by urls are the same as of parse()
+    urls = got['url'].values()
+    checks = [
+        (sorted((item['count'] for item in urls), reverse=True)[:5], parse()),
+        (sorted((item['sum'] // item['count'] for item in urls), reverse=True)[:5], parse(slow_queries=True))
+    ]
+    # Every group_by item covers all counted lines
+    total = sum(item['count'] for item in urls)
+    checks.extend((sum(item['count'] for item in got[fields].values()), total) for fields in group_by)
+    # Max and sum of a host are the max and sum of its urls
+    for host, item in got['host'].items():
+        host_urls = [url_item for url, url_item in got['url'].items() if url.partition('/')[0] == host]
+        checks.append(([item['max'], item['sum']], [max(url_item['max'] for url_item in host_urls),
+                                                    sum(url_item['sum'] for url_item in host_urls)]))
+    # Same results by worker processes and by the time index
+    checks.append((aggregate(group_by, log_files='log.log', jobs=2), got))
+    window = {'start_at': '20/Mar/2018 11:15:49', 'stop_at': '25/Mar/2018 11:17:30'}
+    with TemporaryDirectory() as tmp:
+        # The index is created near the log
+        log_file = os.path.join(tmp, 'log.log')
+        shutil.copy('log.log', log_file)
+        checks.append((aggregate(group_by, log_files=log_file, time_index=True, **window),
+                       aggregate(group_by, log_files=log_file, **window)))
+    for idx, (value, expected) in enumerate(checks):
+        if value != expected:
+            print("Aggregate, check {}: expected {}, got {}".format(idx, expected, value))
+            return
+    print("All aggregate tests passed!")
+
+
 if __name__ == '__main__':
     run_tests()
+    run_follow_tests()
+    run_sketch_tests()
+    run_hitters_tests()
+    run_cache_tests()
+    run_skipped_tests()
+    run_index_tests()
+    run_aggregate_tests()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+import tracemalloc
+from copy import copy
+from random import choice, randint, random, seed
+from time import time
+
+from text_history import DeleteAction, InsertAction, TextHistory
+
+
+def make_actions(size, edits):
+    """Случайные вставки и удаления по всему тексту размером примерно size символов"""
+    seed(0)
+    actions = []
+    for version in range(1, edits + 1):
+        if random() < 0.5:
+            actions.append(InsertAction(randint(0, size), 'ab', version))
+            size += 2
+        else:
+            actions.append(DeleteAction(randint(0, size - 3), 3, version))
+            size -= 3
+    return actions
+
+
+def bench_string(text, actions):
+    """Применение действий пересборкой строки, как до Rope"""
+    t_start = time()
+    for action in actions:
+        text = action.apply(text)
+    return (time() - t_start) / len(actions)
+
+
+def bench_history(text, actions):
+    history = TextHistory()
+    history.insert(text)
+    t_start = time()
+    for action in actions:
+        history.action(action)
+    history.text
+    return (time() - t_start) / len(actions)
+
+
+def bench_text_at(text, actions, snapshot_actions):
+    """Среднее время text_at() по версиям на всем протяжении истории"""
+    history = TextHistory(snapshot_actions=snapshot_actions)
+    history.insert(text)
+    for action in actions:
+        history.action(action)
+    versions = range(1, history.version, max(1, history.version // 100))
+    t_start = time()
+    for version in versions:
+        history.text_at(version)
+    return (time() - t_start) / len(versions), len(history._snapshot_texts)
+
+
+class LegacyInsertAction:
+    """Действие с __dict__, как до __slots__"""
+
+    def __init__(self, pos, text, from_version, to_version=None):
+        self.pos = pos
+        self.from_version = from_version
+        self.to_version = from_version + 1 if to_version is None else to_version
+        self.text = text
+
+
+def keystrokes(count):
+    """Посимвольный набор текста со случайными позициями около конца"""
+    seed(0)
+    for version in range(count):
+        yield max(0, version - randint(0, 20)), choice('abcdefgh '), version
+
+
+def legacy_memory(count):
+    """Память истории до __slots__: словарь версий с копиями действий"""
+    tracemalloc.start()
+    history = {}
+    for pos, text, version in keystrokes(count):
+        history[version] = copy(LegacyInsertAction(pos, text, version))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory
+
+
+def history_memory(count, packed):
+    """Память TextHistory без снимков, за вычетом текста"""
+    tracemalloc.start()
+    history = TextHistory(snapshot_actions=None, packed=packed)
+    for pos, text, version in keystrokes(count):
+        history.action(InsertAction(pos, text, version))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return memory - len(history.text)  # Текст из ASCII символов, по байту на символ
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TextHistory edit speed benchmark')
+    parser.add_argument('-s', action="store", dest="size", type=int, default=10, help='Text size in MB')
+    parser.add_argument('-e', action="store", dest="edits", type=int, default=100000, help='Edits count')
+    parser.add_argument('-a', action="store", dest="actions", type=int, default=10 ** 6,
+                        help='History size for the memory benchmark')
+    params = parser.parse_args(sys.argv[1:])
+
+    text = 'x' * (params.size * 2 ** 20)
+    actions = make_actions(len(text), params.edits)
+    # Пересборка строки слишком медленная для всех изменений, время на изменение одинаково для любого их числа
+    string = bench_string(text, actions[:min(len(actions), 1000)])
+    rope = bench_history(text, actions)
+    print(f'{params.size} MB, {params.edits} edits  string {string * 1e6:,.0f} us/edit  '
+          f'rope {rope * 1e6:,.0f} us/edit  x{string / rope:.0f}')
+
+    for snapshot_actions in (None, 10000, 1000, 100):
+        text_at, snapshots = bench_text_at(text, actions, snapshot_actions)
+        print(f'text_at, snapshot_actions={snapshot_actions}: {text_at * 1e3:,.1f} ms, {snapshots} snapshots')
+
+    for name, memory in (('__dict__ + copy', legacy_memory(params.actions)),
+                         ('__slots__', history_memory(params.actions, packed=False)),
+                         ('packed', history_memory(params.actions, packed=True))):
+        print(f'{params.actions} actions, {name:<16} {memory / 2 ** 20:8.1f} MB  '
+              f'{memory / params.actions:6.1f} B/action')
+
+
+if __name__ == '__main__':
+    main()
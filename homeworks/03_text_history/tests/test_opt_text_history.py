@@ -1,3 +1,4 @@
+from random import choice, randint, random, seed
 from unittest import TestCase
 from text_history import TextHistory, InsertAction, ReplaceAction, DeleteAction
 
@@ -32,3 +33,60 @@ class TextHistoryOptimization(TestCase):
         opt_value = DeleteAction(3, 8, 1, 3)
         self.assertEqual(action.__dict__, opt_value.__dict__)
 
+
+    def test_compact(self):
+        h = TextHistory()
+        h.insert('abc')
+        h.insert('xyz', pos=1)
+        h.delete(pos=1, length=3)  # Вставка удалена целиком
+        h.insert('d', pos=2)
+        h.delete(pos=1, length=1)  # Удаление перед предыдущей вставкой
+        h.replace('E', pos=1)
+        self.assertEqual('aEc', h.text)
+        actions = h.get_actions(1, compact=True)
+        self.assertEqual(1, len(actions))
+        self.assertEqual(ReplaceAction(1, 'E', 1, 6).__dict__, actions[0].__dict__)
+
+        h.insert('abc', pos=1)
+        h.delete(pos=1, length=3)  # Вставка и удаление взаимно уничтожаются
+        self.assertEqual([], h.get_actions(6, compact=True))
+
+    def test_compact__random(self):
+        seed(0)
+        for _ in range(1000):
+            h = TextHistory(snapshot_actions=choice([1, 5, None]))
+            h.insert(''.join(choice('abc') for _ in range(randint(0, 10))))
+            for _ in range(randint(1, 30)):
+                size = len(h.text)
+                value = ''.join(choice('xyz') for _ in range(randint(0, 4)))
+                kind = random()
+                if kind < 0.4:
+                    h.insert(value, pos=randint(0, size))
+                elif kind < 0.7 and size:
+                    pos = randint(0, size - 1)
+                    h.delete(pos, randint(0, size - pos))
+                elif kind < 0.9:
+                    h.replace(value, pos=randint(0, size))
+                else:
+                    h.action(InsertAction(randint(0, size), value, h.version, h.version + randint(1, 3)))
+
+            from_version = randint(0, h.version)
+            to_version = randint(from_version, h.version)
+            optimized = h.get_actions(from_version, to_version)
+            actions = h.get_actions(from_version, to_version, compact=True)
+            self.assertLessEqual(len(actions), len(optimized))
+
+            if not optimized:
+                continue
+
+            # Диапазон — от начала первого действия не раньше from_version до конца последнего
+            version = optimized[0].from_version
+            text = h.text_at(version)
+            for action in actions:
+                self.assertEqual(version, action.from_version)
+                self.assertLess(action.from_version, action.to_version)
+                text = action.apply(text)
+                version = action.to_version
+            self.assertEqual(h.text_at(optimized[-1].to_version), text)
+            if actions:
+                self.assertEqual(optimized[-1].to_version, actions[-1].to_version)
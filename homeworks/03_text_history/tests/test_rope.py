@@ -0,0 +1,36 @@
+from random import choice, randint, random, seed
+from unittest import TestCase
+
+from text_history import DeleteAction, InsertAction, ReplaceAction, Rope, TextHistory
+
+
+class RopeTestCase(TestCase):
+    def setUp(self):
+        self.chunk_size = Rope.chunk_size
+        Rope.chunk_size = 3  # Много мелких кусков, чтобы изменения проходили через разрезание дерева
+
+    def tearDown(self):
+        Rope.chunk_size = self.chunk_size
+
+    def test_random_actions(self):
+        seed(0)
+        for _ in range(50):
+            h = TextHistory()
+            text = ''
+            for _ in range(100):
+                pos = randint(-2, len(text) + 2)
+                value = ''.join(choice('abc') for _ in range(randint(0, 7)))
+                action = choice([InsertAction(pos, value, h.version), ReplaceAction(pos, value, h.version),
+                                 DeleteAction(pos, randint(-1, 7), h.version)])
+                text = action.apply(text)
+                h.action(action)
+                if random() < 0.2:
+                    self.assertEqual(text, h.text)
+            self.assertEqual(text, h.text)
+
+    def test_build(self):
+        for size in range(10):
+            rope = Rope('x' * size)
+            self.assertEqual(size, len(rope))
+            rope.insert(size // 2, 'ab')
+            self.assertEqual('x' * (size // 2) + 'ab' + 'x' * (size - size // 2), rope.text)
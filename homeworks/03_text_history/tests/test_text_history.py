@@ -171,3 +171,111 @@ class TextHistoryTestCase(TestCase):
 
         h.insert('a')
         self.assertEqual([], h.get_actions(0, 0))
+
+    def test_get_actions__range(self):
+        h = TextHistory()
+        h.insert('a')
+        h.action(InsertAction(pos=0, text='b', from_version=1, to_version=5))
+        h.delete(pos=0, length=1)
+        h.replace('c', pos=0)
+
+        def versions(actions):
+            return [(action.from_version, action.to_version) for action in actions]
+
+        self.assertEqual([(0, 1), (1, 5), (5, 6), (6, 7)], versions(h.get_actions(0, 7)))
+        self.assertEqual([(1, 5)], versions(h.get_actions(1, 5)))
+        self.assertEqual([(5, 6), (6, 7)], versions(h.get_actions(3)))
+        self.assertEqual([], h.get_actions(2, 4))
+        self.assertEqual([(0, 1)], versions(h.get_actions(to_version=4)))
+
+        actions = h.get_actions(1, lazy=True)
+        self.assertNotIsInstance(actions, list)
+        self.assertEqual(versions(h.get_actions(1)), versions(actions))
+
+        with self.assertRaises(ValueError):
+            h.get_actions(0, 8)
+
+    def test_action__old_version(self):
+        h = TextHistory()
+        h.action(InsertAction(pos=0, text='abc', from_version=0, to_version=10))
+
+        with self.assertRaises(ValueError):
+            h.action(InsertAction(pos=0, text='abc', from_version=0, to_version=5))
+        self.assertEqual(10, h.version)
+
+    def test_text_at(self):
+        for params in ({}, {'snapshot_actions': 1}, {'snapshot_actions': 3}, {'snapshot_actions': None},
+                       {'snapshot_actions': None, 'snapshot_size': 4}):
+            h = TextHistory(**params)
+            texts = {0: ''}
+            for idx in range(20):
+                if idx % 3 == 2:
+                    h.delete(pos=idx % 4, length=2)
+                elif idx % 5 == 4:
+                    h.action(ReplaceAction(pos=1, text='XY', from_version=h.version, to_version=h.version + 2))
+                else:
+                    h.insert(str(idx) * 3, pos=idx % 3)
+                texts[h.version] = h.text
+
+            text = ''
+            for version in range(h.version + 1):
+                text = texts.get(version, text)
+                self.assertEqual(text, h.text_at(version))
+
+            with self.assertRaises(ValueError):
+                h.text_at(h.version + 1)
+            with self.assertRaises(ValueError):
+                h.text_at(-1)
+
+    def test_action__immutable(self):
+        action = InsertAction(pos=0, text='abc', from_version=0)
+
+        with self.assertRaises(AttributeError):
+            action.pos = 1
+        with self.assertRaises(AttributeError):
+            action.extra = 1
+        self.assertEqual({'pos': 0, 'from_version': 0, 'to_version': 1, 'text': 'abc'}, action.__dict__)
+
+    def test_packed(self):
+        histories = [TextHistory(), TextHistory(packed=True)]
+        for h in histories:
+            h.insert('héllo')
+            h.replace('ÿ☺', pos=1)
+            h.delete(pos=0, length=2)
+            h.action(InsertAction(pos=1, text='abc', from_version=h.version, to_version=10))
+            h.insert('d', pos=4)
+
+        plain, packed = [[(type(action), action.__dict__) for action in h.get_actions(0)] for h in histories]
+        self.assertEqual(plain, packed)
+        self.assertEqual(histories[0].text, histories[1].text)
+        self.assertEqual(histories[0].text_at(3), histories[1].text_at(3))
+
+    def test_action__failed(self):
+        for packed in (False, True):
+            h = TextHistory(packed=packed)
+            h.insert('abc')
+
+            with self.assertRaises(TypeError):
+                h.insert(5, pos=1)
+            if packed:
+                with self.assertRaises(OverflowError):
+                    h.action(InsertAction(pos=0, text='x', from_version=1, to_version=2 ** 70))
+
+            self.assertEqual(1, h.version)
+            self.assertEqual('abc', h.text)
+            self.assertEqual(2, h.insert('d'))
+            self.assertEqual(['abc', 'd'], [action.text for action in h._actions])
+            self.assertEqual([(0, 2)], [(a.from_version, a.to_version) for a in h.get_actions(0, 2)])
+            self.assertEqual('abc', h.text_at(1))
+
+    def test_length_at(self):
+        h = TextHistory()
+        lengths = [0]
+        for idx in range(200):
+            # Позиции и вне текста, как у срезов строк
+            pos = [idx % 5, len(h.text) + 1, -1][idx % 4 % 3]
+            action = [InsertAction(pos, 'ab' * (idx % 3), h.version), ReplaceAction(max(pos, 0), 'xyz', h.version),
+                      DeleteAction(max(pos, 0), idx % 4, h.version)][idx % 3]
+            h.action(action)
+            lengths.append(len(h.text))
+        self.assertEqual(lengths, [h._length_at(count) for count in range(len(lengths))])
@@ -1,27 +1,80 @@
-from copy import copy
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from random import random
 
 
 class TextHistory:
-    def __init__(self):
-        self._text = ''
+    length_step = 64  # Длина текста запоминается через столько действий
+
+    def __init__(self, snapshot_actions=None, snapshot_size=None, packed=False):
+        """
+        snapshot_actions и snapshot_size — снимок текста делается через столько действий или после изменения
+        стольких символов (None — не учитывать, по умолчанию снимков нет и text_at() применяет действия с начала).
+        Каждый снимок — полная копия текста: чем чаще снимки, тем больше памяти и быстрее text_at().
+        packed — хранить историю в массивах ActionColumns вместо списка объектов действий"""
+        self._text = Rope()
         self._version = 0
-        self._history = {}
+        # История по возрастанию версий: действия и версии после каждого из них
+        self._actions = ActionColumns() if packed else []
+        self._versions = array('q') if packed else []
+        self._snapshot_actions = snapshot_actions
+        self._snapshot_size = snapshot_size
+        # Снимки текста: число примененных к снимку действий и текст
+        self._snapshot_counts = [0]
+        self._snapshot_texts = ['']
+        self._changed = 0  # Число измененных символов после последнего снимка
+        self._lengths = [0]  # Длины текста после каждых length_step действий
 
     @property
     def text(self):
-        return self._text
+        return self._text.text
 
     @property
     def version(self):
         return self._version
 
     def _add_history(self, action):
-        self._history[self._version] = copy(action)
+        self._versions.append(action.to_version)
+        # Действия неизменяемы, поэтому хранятся без копирования
+        self._actions.append(action)
+
+    def _snapshot(self, action):
+        self._changed += action.size()
+        count = len(self._actions)
+        if count % self.length_step == 0:
+            self._lengths.append(len(self._text))
+        if self._snapshot_actions and count - self._snapshot_counts[-1] >= self._snapshot_actions or \
+                self._snapshot_size and self._changed >= self._snapshot_size:
+            self._snapshot_counts.append(count)
+            self._snapshot_texts.append(self.text)
+            self._changed = 0
+
+    def _length_at(self, count):
+        """Длина текста после count действий: от ближайшей запомненной длины по resize() действий"""
+        size = self._lengths[count // self.length_step]
+        for idx in range(count - count % self.length_step, count):
+            size = self._actions[idx].resize(size)
+        return size
+
+    def text_at(self, version):
+        """Текст в версии version: ближайший более ранний снимок с примененными после него действиями"""
+        if not 0 <= version <= self._version:
+            raise ValueError
+        count = bisect_right(self._versions, version)
+        if count == len(self._actions):
+            return self.text
+        snapshot = bisect_right(self._snapshot_counts, count) - 1
+        rope = Rope(self._snapshot_texts[snapshot])
+        for idx in range(self._snapshot_counts[snapshot], count):
+            self._actions[idx].edit(rope)
+        return rope.text
 
     def _check(self, pos, length=None):
+        size = len(self._text)
         if pos is None:
-            pos = len(self._text)
-        elif not 0 <= pos <= len(self._text) or length is not None and pos + length > len(self._text):
+            pos = size
+        elif not 0 <= pos <= size or length is not None and pos + length > size:
             raise ValueError
         return pos
 
@@ -41,44 +94,75 @@ class TextHistory:
         return self.action(action)
 
     def action(self, action):
-        if not (action.to_version > action.from_version):
+        if not (action.to_version > action.from_version) or action.to_version <= self._version:
             raise ValueError
-        self._text = action.apply(self._text)
+        if isinstance(self._versions, array):
+            # Версия, не помещающаяся в массив packed, отклоняется до изменения текста
+            array(self._versions.typecode, [action.to_version])
+        action.edit(self._text)
         self._add_history(action)
+        self._snapshot(action)
         self._version = action.to_version
         return self._version
 
-    def get_actions(self, from_version=None, to_version=None):
-
+    def get_actions(self, from_version=None, to_version=None, lazy=False, compact=False):
+        """
+        Действия, начинающиеся не раньше from_version и заканчивающиеся не позже to_version, с оптимизациями.
+        Границы ищутся бинарным поиском по версиям. С lazy возвращается итератор, оптимизирующий действия
+        по мере чтения. С compact весь диапазон сжимается в минимальный набор действий (см. _compact)"""
         if from_version is None and to_version is None or from_version == to_version == 0:
-            return []
-
-        if not self._history:
-            raise ValueError
+            return iter([]) if lazy else []
 
         if from_version is None:
             from_version = 0
-        elif from_version < 0:
-            raise ValueError
-
         if to_version is None:
-            to_version = max(self._history.keys())
-        elif from_version > to_version or to_version > max(self._history.keys()):
+            to_version = self._version
+        if not 0 <= from_version <= to_version <= self._version:
             raise ValueError
 
-        out = []
-        for ver, obj in self._history.items():
-            if ver < from_version:
-                continue
-            elif ver <= to_version:
-                out.append(obj)
-                if len(out) > 1:
-                    match = self._compare(out[-2:])
-                    if match:
-                        out = out[:-2] + [match]
+        versions = self._versions
+        # Первое действие начинается с версии после предыдущего, самое первое — с 0
+        start = bisect_left(versions, from_version) + 1 if from_version > 0 else 0
+        end = bisect_right(versions, to_version)
+        actions = self._iter_actions(start, end)
+        if compact and start < end:
+            actions = self._compact(start, end, list(actions))
+        return iter(actions) if lazy else list(actions)
+
+    def _compact(self, start, end, optimized):
+        """
+        Сжатие действий с индексами от start до end: действия применяются к EditScript исходного текста,
+        отличия результата от исходного текста по регионам превращаются в действия. Вставки, удаленные позже,
+        не попадают в результат, каждый измененный участок дает одно действие (два, если нужны и замена,
+        и вставка или удаление). Если сжать не получилось, возвращается optimized"""
+        from_version = self._versions[start - 1] if start else 0
+        to_version = self._versions[end - 1]
+        script = EditScript(self._length_at(start))
+        try:
+            for idx in range(start, end):
+                self._actions[idx].edit(script)
+        except ValueError:
+            return optimized
+        edits = script.edits()
+        if len(edits) >= len(optimized) or from_version + len(edits) > to_version:
+            return optimized
+        # Версии по порядку от начала диапазона, последнее действие заканчивается концом диапазона
+        versions = list(range(from_version, from_version + len(edits))) + [to_version]
+        return [cls(pos, value, versions[idx], versions[idx + 1]) for idx, (cls, pos, value) in enumerate(edits)]
+
+    def _iter_actions(self, start, end):
+        pending = None
+        for idx in range(start, end):
+            action = self._actions[idx]
+            match = pending is not None and self._compare((pending, action))
+            if match:
+                pending = match
             else:
-                break
-        return out
+                if pending is not None:
+                    yield pending
+                pending = action
+        if pending is not None:
+            yield pending
 
     @staticmethod
     def _compare(values):
@@ -93,40 +177,371 @@ class TextHistory:
             return False
 
 
+class RopeNode:
+    __slots__ = ('text', 'left', 'right', 'size', 'priority')
+
+    def __init__(self, text):
+        self.text = text
+        self.left = self.right = None
+        self.size = len(text)  # Длина текста поддерева
+        self.priority = random()
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = _size(node.left) + len(node.text) + _size(node.right)
+    return node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _split(node, pos):
+    """Разделение дерева на первые pos символов и остальные"""
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+    if pos <= left_size:
+        left, node.left = _split(node.left, pos)
+        return left, _update(node)
+    cut = pos - left_size
+    if cut >= len(node.text):
+        node.right, right = _split(node.right, cut - len(node.text))
+        return _update(node), right
+    # Позиция внутри куска узла: хвост куска уходит в правую часть отдельным узлом
+    tail = RopeNode(node.text[cut:])
+    node.text = node.text[:cut]
+    right, node.right = _merge(tail, node.right), None
+    return _update(node), right
+
+
+class Rope:
+    """
+    Текст в декартовом дереве по неявному ключу из кусков не длиннее chunk_size символов.
+    Вставка и удаление — O(log n) по числу кусков, строка текста собирается только при обращении к text
+    и кэшируется до следующего изменения"""
+    chunk_size = 1024
+
+    def __init__(self, text=''):
+        self._root = self._build(text)
+        self._text = text
+
+    def __len__(self):
+        return _size(self._root)
+
+    @property
+    def text(self):
+        if self._text is None:
+            parts, stack, node = [], [], self._root
+            while stack or node is not None:
+                while node is not None:
+                    stack.append(node)
+                    node = node.left
+                node = stack.pop()
+                parts.append(node.text)
+                node = node.right
+            self._text = ''.join(parts)
+        return self._text
+
+    @classmethod
+    def _build(cls, text):
+        """Дерево из кусков текста, сливаемых попарно: O(n) вместо n вставок"""
+        nodes = [RopeNode(text[idx:idx + cls.chunk_size]) for idx in range(0, len(text), cls.chunk_size)]
+        while len(nodes) > 1:
+            nodes = [_merge(*pair) for pair in zip(nodes[::2], nodes[1::2])] + nodes[len(nodes) // 2 * 2:]
+        return nodes[0] if nodes else None
+
+    def _edit_chunk(self, pos, length, text):
+        """Изменение на месте, если оно целиком внутри одного куска и кусок не станет пустым или длинным"""
+        path, node = [], self._root
+        while node is not None:
+            path.append(node)
+            left_size, chunk_len = _size(node.left), len(node.text)
+            if node.left is not None and pos + length <= left_size:
+                node = node.left
+            elif left_size <= pos and pos + length <= left_size + chunk_len:
+                if not 0 < chunk_len - length + len(text) <= self.chunk_size:
+                    return False
+                cut = pos - left_size
+                node.text = node.text[:cut] + text + node.text[cut + length:]
+                for parent in path:
+                    parent.size += len(text) - length
+                return True
+            elif pos >= left_size + chunk_len:
+                pos -= left_size + chunk_len
+                node = node.right
+            else:
+                return False
+        return False
+
+    def replace(self, pos, length, text):
+        """Замена length символов с позиции pos на text"""
+        if not (length or text):
+            return
+        self._text = None
+        if self._edit_chunk(pos, length, text):
+            return
+        left, rest = _split(self._root, pos)
+        right = _split(rest, length)[1]
+        self._root = _merge(_merge(left, self._build(text)), right)
+
+    def insert(self, pos, text):
+        self.replace(pos, 0, text)
+
+    def delete(self, pos, length):
+        self.replace(pos, length, '')
+
+    def set(self, text):
+        self._root = self._build(text)
+        self._text = text
+
+
+class EditScript(Rope):
+    """
+    Результат действий над неизвестным текстом длины size: куски дерева — диапазоны range позиций
+    исходного текста или вставленные строки"""
+
+    def __init__(self, size):
+        super(EditScript, self).__init__()
+        if size:
+            self._root = RopeNode(range(size))
+        self._size = size
+
+    @property
+    def text(self):
+        raise ValueError
+
+    def set(self, text):
+        raise ValueError
+
+    def _edit_chunk(self, pos, length, text):
+        return False
+
+    def _chunks(self):
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.text
+            node = node.right
+
+    def edits(self):
+        """Действия, превращающие исходный текст в результат: класс, позиция и текст или длина"""
+        actions = []
+        pos = kept = 0  # Позиции в результате и в исходном тексте после последнего сохраненного куска
+        text = []
+        for chunk in chain(self._chunks(), [range(self._size, self._size)]):
+            if isinstance(chunk, str):
+                text.append(chunk)
+                continue
+            deleted, inserted = chunk.start - kept, ''.join(text)
+            if inserted and deleted and (len(inserted) == deleted or len(inserted) > deleted and not chunk):
+                # Замена в конце текста дописывает не поместившееся
+                actions.append((ReplaceAction, pos, inserted))
+            elif len(inserted) > deleted:
+                if deleted:
+                    actions.append((ReplaceAction, pos, inserted[:deleted]))
+                actions.append((InsertAction, pos + deleted, inserted[deleted:]))
+            elif deleted:
+                if inserted:
+                    actions.append((ReplaceAction, pos, inserted))
+                actions.append((DeleteAction, pos + len(inserted), deleted - len(inserted)))
+            pos += len(inserted) + len(chunk)
+            kept = chunk.stop
+            text = []
+        return actions
+
+
 class Action:
+    """
+    Неизменяемое действие: поля в __slots__ (наследники объявляют в них свои поля),
+    __dict__ — только словарь полей для сравнения и вывода"""
+    __slots__ = ('pos', 'from_version', 'to_version')
+
     def __init__(self, pos, from_version, to_version):
         if to_version is None:
             to_version = from_version + 1
-        self.pos = pos
-        self.from_version = from_version
-        self.to_version = to_version
+        object.__setattr__(self, 'pos', pos)
+        object.__setattr__(self, 'from_version', from_version)
+        object.__setattr__(self, 'to_version', to_version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    __delattr__ = __setattr__
+
+    @property
+    def __dict__(self):
+        return {name: getattr(self, name)
+                for cls in reversed(type(self).__mro__) for name in getattr(cls, '__slots__', ())}
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return _restore_action, (type(self), self.__dict__)
 
     def apply(self, text):
         ...
 
+    def edit(self, rope):
+        """Применение действия к тексту в Rope"""
+        rope.set(self.apply(rope.text))
+
+    def size(self):
+        """Число символов, изменяемых действием"""
+        return 1
+
+    def resize(self, size):
+        """Длина текста длины size после действия"""
+        return len(self.apply(' ' * size))
+
 
 class InsertAction(Action):
+    __slots__ = ('text',)
+
     def __init__(self, pos, text, from_version, to_version=None):
         super(InsertAction, self).__init__(pos, from_version, to_version)
-        self.text = text
+        object.__setattr__(self, 'text', text)
 
     def apply(self, text):
         return text[:self.pos] + self.text + text[self.pos:]
 
+    def edit(self, rope):
+        if 0 <= self.pos <= len(rope):
+            rope.insert(self.pos, self.text)
+        else:
+            super(InsertAction, self).edit(rope)
+
+    def size(self):
+        return len(self.text)
+
+    def resize(self, size):
+        if 0 <= self.pos <= size:
+            return size + len(self.text)
+        return super(InsertAction, self).resize(size)
+
 
 class ReplaceAction(Action):
+    __slots__ = ('text',)
+
     def __init__(self, pos, text, from_version, to_version=None):
         super(ReplaceAction, self).__init__(pos, from_version, to_version)
-        self.text = text
+        object.__setattr__(self, 'text', text)
 
     def apply(self, text):
         return text[:self.pos] + self.text + text[self.pos + len(self.text):]
 
+    def edit(self, rope):
+        if 0 <= self.pos <= len(rope):
+            rope.replace(self.pos, min(len(self.text), len(rope) - self.pos), self.text)
+        else:
+            super(ReplaceAction, self).edit(rope)
+
+    def size(self):
+        return len(self.text)
+
+    def resize(self, size):
+        if 0 <= self.pos <= size:
+            return max(size, self.pos + len(self.text))
+        return super(ReplaceAction, self).resize(size)
+
 
 class DeleteAction(Action):
+    __slots__ = ('length',)
+
     def __init__(self, pos, length, from_version, to_version=None):
         super(DeleteAction, self).__init__(pos, from_version, to_version)
-        self.length = length
+        object.__setattr__(self, 'length', length)
 
     def apply(self, text):
         return text[:self.pos] + text[self.pos + self.length:]
+
+    def edit(self, rope):
+        if 0 <= self.pos <= len(rope) and self.length >= 0:
+            rope.delete(self.pos, min(self.length, len(rope) - self.pos))
+        else:
+            super(DeleteAction, self).edit(rope)
+
+    def size(self):
+        return self.length
+
+    def resize(self, size):
+        if 0 <= self.pos <= size and self.length >= 0:
+            return size - min(self.length, size - self.pos)
+        return super(DeleteAction, self).resize(size)
+
+
+def _restore_action(cls, fields):
+    action = cls.__new__(cls)
+    for name, value in fields.items():
+        object.__setattr__(action, name, value)
+    return action
+
+
+class ActionColumns:
+    """
+    История действий в параллельных массивах: тип, позиция, длина, версии и смещение текста в общем буфере
+    текстов вставок и замен в UTF-8. Действие создается заново при обращении. Действия других классов
+    и с полями, не помещающимися в 64 бита, хранятся объектами"""
+    kinds = (InsertAction, ReplaceAction, DeleteAction)
+
+    def __init__(self):
+        self._kind = array('b')
+        self._pos = array('q')
+        self._length = array('q')  # Длина удаления или текста в буфере в байтах
+        self._start = array('q')  # Смещение текста в буфере
+        self._from = array('q')
+        self._to = array('q')
+        self._arena = bytearray()
+        self._objects = {}  # Индекс: действие, не представимое в массивах
+
+    def __len__(self):
+        return len(self._kind)
+
+    def append(self, action):
+        kind = self.kinds.index(type(action)) if type(action) in self.kinds else -1
+        row = None
+        if kind >= 0:
+            data = b'' if kind == 2 else action.text.encode('utf-8', 'surrogatepass')
+            length = action.length if kind == 2 else len(data)
+            try:
+                row = array('q', (action.pos, length, len(self._arena), action.from_version, action.to_version))
+            except (OverflowError, TypeError):
+                pass
+        if row is None:
+            kind, row = -1, array('q', bytes(40))
+            self._objects[len(self)] = action
+        else:
+            self._arena += data
+        for column, value in zip((self._pos, self._length, self._start, self._from, self._to), row):
+            column.append(value)
+        self._kind.append(kind)
+
+    def __getitem__(self, idx):
+        kind = self._kind[idx]
+        if kind < 0:
+            return self._objects[idx]
+        pos, length, from_version, to_version = self._pos[idx], self._length[idx], self._from[idx], self._to[idx]
+        if kind == 2:
+            return DeleteAction(pos, length, from_version, to_version)
+        start = self._start[idx]
+        text = self._arena[start:start + length].decode('utf-8', 'surrogatepass')
+        return self.kinds[kind](pos, text, from_version, to_version)